@@ -1,9 +1,19 @@
 import time
-from importlib import invalidate_caches
 
 import streamlit as st
+from streamlit.logger import get_logger
 from utils import get_player_list
-from src.game import CricketGame
+from src.assets import get_dart_image
+from src.game import RESUME_IDLE_DELAY, CricketGame, load_unfinished_games
+from src.instrumentation import report_db_calls, report_fragment_db_calls
+from src.session_memory import log_session_memory
+from src.simulation import get_win_probabilities
+from src.storage import get_storage
+from src.warmup import run_warmup
+
+logger = get_logger(__name__)
+
+UNFINISHED_MATCHES_SHOWN = 10
 
 st.set_page_config(
     page_title="Nouvelle partie",
@@ -12,6 +22,8 @@ st.set_page_config(
 
 if "app_loaded" not in st.session_state:
     st.session_state.app_loaded = False
+    st.session_state.session_started_at = time.perf_counter()
+    st.session_state.first_interactive_logged = False
 
 if "match" not in st.session_state:
     st.session_state.match_started = False
@@ -20,68 +32,54 @@ if "match" not in st.session_state:
 if "save_done" not in st.session_state:
     st.session_state.save_done = False
 
-def save_match():
-    game.state_to_base()
+def save_match(game: CricketGame):
+    # Callback : l'erreur est affichée par le fragment, pas ici.
+    try:
+        game.state_to_base()
+    except Exception as e:
+        logger.exception("Erreur lors de la sauvegarde du match %s", game.id_match)
+        st.session_state.save_error = str(e)
+        return
+    game.compact()
     st.session_state.save_done = True
-    st.balloons()
+    st.session_state.show_save_feedback = True
 
 def new_match():
+    st.session_state.pop("match", None)
     st.session_state.app_loaded = False
     st.session_state.match_started = False
     st.session_state.match_ended = False
     st.session_state.save_done = False
 
-if not st.session_state.app_loaded:
-    loading_placeholder = st.empty()
-
-    with loading_placeholder.container():
-        st.write("Chargement de la partie...")
-        progress_bar = st.progress(0)
-        for i in range(100):
-            time.sleep(0.01)
-            progress_bar.progress(i + 1)
-
-        st.session_state.app_loaded = True
-        st.rerun()
-
-player_list = get_player_list()
-start_match_placeholder = st.empty()
-dart_url = "./assets/dart.png"
+@st.fragment
+def play_area(game: CricketGame, text_icons: bool):
+    """
+    Zone de jeu : tableau des scores, fléchettes restantes et boutons de lancer.
 
-if not st.session_state.match_started:
+    Isolée dans un fragment, elle est seule réexécutée à chaque fléchette ;
+    la liste des joueurs et le reste de la page ne sont pas recalculés.
+    """
+    started_at = time.perf_counter()
+    dart_image = get_dart_image()
 
-    with start_match_placeholder.container():
-        select_players = st.multiselect("Sélectionnez les joueurs:",
-                                        options=player_list,
-                                        max_selections=6)
-        start_button = st.button("Commencer la partie", type="primary")
-
-    if start_button and len(select_players) >= 2:
-        st.session_state.match = CricketGame(player_list=select_players)
-        st.session_state.match_started = True
-        invalidate_caches()
-        st.rerun()
-    elif start_button:
-        st.write("Il faut au moins deux joueurs pour commencer la partie.")
-else:
-    game = st.session_state.match
     st.write(f"Tour: {game.get_tour_number()}/20")
     with st.container(horizontal=True):
         for i in range(game.get_num_remaining_darts()):
-            st.image(dart_url, width=30)
+            st.image(dart_image, width=30)
 
-    state_df, points_df = game.get_df_to_print()
+    state_df, points_df = game.get_df_to_print(text_icons)
 
-    st.dataframe(
-        state_df,
-        column_config={
-            name: st.column_config.ImageColumn(name)
-            for name in player_list
-        },
-    )
+    st.dataframe(state_df, column_config=game.get_column_config(text_icons))
 
     st.dataframe(points_df, hide_index=True)
 
+    if not game.match_ended:
+        win_probabilities = get_win_probabilities(game)
+        st.caption(
+            "Probabilités de victoire : "
+            + " · ".join(f"{player} {probability:.0%}" for player, probability in win_probabilities.items())
+        )
+
     container_points_1 = st.container(horizontal=True)
     with container_points_1:
         targets = ["20", "19", "18", "17"]
@@ -109,12 +107,95 @@ else:
                 "Enregistrer la partie",
                 type="primary",
                 on_click=save_match,
+                args=[game],
                 disabled=st.session_state.save_done
             )
-            st.button(
-                "Nouvelle Partie",
-                type="secondary",
-                on_click=new_match
-            )
+            if st.button("Nouvelle Partie", type="secondary"):
+                # Retour à la sélection des joueurs : toute la page doit être réexécutée.
+                new_match()
+                st.rerun(scope="app")
+        save_error = st.session_state.pop("save_error", None)
+        if save_error is not None:
+            st.error(f"Erreur lors de la sauvegarde du match : {save_error}")
+        if st.session_state.pop("show_save_feedback", False):
+            st.success("Match sauvegardé avec succès!")
+            st.balloons()
         if st.session_state.save_done:
-            st.markdown(game.get_ranking_to_print(), unsafe_allow_html=True)
\ No newline at end of file
+            st.markdown(game.get_ranking_to_print(), unsafe_allow_html=True)
+
+    logger.debug("Rendu de la zone de jeu : %.1f ms", (time.perf_counter() - started_at) * 1000)
+    report_fragment_db_calls("Nouvelle_Partie")
+
+
+if not st.session_state.app_loaded:
+    loading_placeholder = st.empty()
+
+    with loading_placeholder.container():
+        st.write("Chargement de la partie...")
+        progress_bar = st.progress(0)
+        run_warmup(
+            lambda name, done, total: progress_bar.progress(done / total, text=f"{name} ({done}/{total})")
+        )
+
+    loading_placeholder.empty()
+    st.session_state.app_loaded = True
+
+start_match_placeholder = st.empty()
+
+if not st.session_state.match_started:
+    player_list = get_player_list()
+
+    with start_match_placeholder.container():
+        select_players = st.multiselect("Sélectionnez les joueurs:",
+                                        options=player_list,
+                                        max_selections=6)
+        start_button = st.button("Commencer la partie", type="primary")
+
+    if not st.session_state.first_interactive_logged:
+        st.session_state.first_interactive_logged = True
+        logger.info(
+            "Temps jusqu'au premier écran interactif : %.0f ms",
+            (time.perf_counter() - st.session_state.session_started_at) * 1000
+        )
+
+    if start_button and len(select_players) >= 2:
+        st.session_state.match = CricketGame(player_list=select_players)
+        st.session_state.match_started = True
+        st.rerun()
+    elif start_button:
+        st.write("Il faut au moins deux joueurs pour commencer la partie.")
+
+    if st.checkbox("Reprendre une partie interrompue"):
+        unfinished_games = load_unfinished_games(UNFINISHED_MATCHES_SHOWN)
+        st.caption(
+            f"Les parties jouées dans les {RESUME_IDLE_DELAY.seconds // 60} dernières minutes "
+            "ne sont pas proposées : elles sont sans doute en cours sur un autre appareil."
+        )
+        if not unfinished_games:
+            st.write("Aucune partie interrompue.")
+        else:
+            resume_id = st.selectbox(
+                "Partie à reprendre :",
+                options=list(unfinished_games),
+                format_func=lambda match_id: (
+                    f"{', '.join(unfinished_games[match_id].player_list)} "
+                    f"(tour {unfinished_games[match_id].get_tour_number()}/20)"
+                )
+            )
+            with st.container(horizontal=True):
+                resume_button = st.button("Reprendre la partie", type="primary")
+                discard_button = st.button("Abandonner la partie", type="secondary")
+            if resume_button:
+                st.session_state.match = unfinished_games[resume_id]
+                st.session_state.match_started = True
+                st.rerun()
+            elif discard_button:
+                get_storage().discard_match(resume_id)
+                st.rerun()
+else:
+    text_icons = st.sidebar.toggle("Marques en texte", key="text_icons")
+    play_area(st.session_state.match, text_icons)
+
+log_session_memory()
+
+report_db_calls("Nouvelle_Partie")
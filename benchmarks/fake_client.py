@@ -0,0 +1,244 @@
+"""
+Client Supabase en mémoire pour les benchmarks.
+
+Implémente le sous-ensemble de l'API de requêtes utilisé par SupabaseStorage
+(select/insert/upsert/update, eq, gte, lt, in_, or_ par curseur, order, limit, range, rpc
+save_match et discard_match) et compte chaque aller-retour (appel à execute()). Une latence
+simulée par aller-retour peut être ajoutée pour modéliser le réseau, et le
+plafond de lignes par réponse de PostgREST (max_rows) peut être reproduit.
+"""
+import itertools
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+
+from src.storage import ELO_CHECK_TOLERANCE, PLAYER_STATS_COUNTERS, STALE_ELO_ERROR_CODE
+
+CURSOR_FILTER = re.compile(
+    r'created_at\.(gt|lt)\."([^"]+)",and\(created_at\.eq\."[^"]+",id\.(?:gt|lt)\.(\d+)\)'
+)
+
+
+class FakeQuery:
+    """Requête sur une table du client en mémoire."""
+
+    def __init__(self, client: "FakeClient", table: str):
+        self.client = client
+        self.table = table
+        self.operation = "select"
+        self.columns: Optional[tuple] = None
+        self.filters: List[Callable[[Dict], bool]] = []
+        self.orders: List[tuple] = []
+        self.row_limit: Optional[int] = None
+        self.row_offset = 0
+        self.payload = None
+        self.on_conflict = "id"
+        self.ignore_duplicates = False
+
+    def select(self, *columns, **kwargs) -> "FakeQuery":
+        self.columns = columns
+        return self
+
+    def insert(self, rows, **kwargs) -> "FakeQuery":
+        self.operation = "insert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id", ignore_duplicates: bool = False, **kwargs) -> "FakeQuery":
+        self.operation = "upsert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: Dict) -> "FakeQuery":
+        self.operation = "update"
+        self.payload = values
+        return self
+
+    def eq(self, column: str, value) -> "FakeQuery":
+        if "." in column:
+            # Filtre sur une table jointe (select "table!inner(colonne)"), reliée par match_id.
+            table, column = column.split(".", 1)
+            self.filters.append(lambda row: any(
+                related["match_id"] == row["id"] and related.get(column) == value
+                for related in self.client.tables.get(table, [])
+            ))
+            return self
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column: str, value) -> "FakeQuery":
+        self.filters.append(lambda row: row.get(column) >= value)
+        return self
+
+    def lt(self, column: str, value) -> "FakeQuery":
+        self.filters.append(lambda row: row.get(column) < value)
+        return self
+
+    def in_(self, column: str, values) -> "FakeQuery":
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def or_(self, expression: str) -> "FakeQuery":
+        match = CURSOR_FILTER.fullmatch(expression)
+        if match is None:
+            raise NotImplementedError(expression)
+        op, created_at, match_id = match.group(1), match.group(2), int(match.group(3))
+        if op == "gt":
+            self.filters.append(
+                lambda row: (row["created_at"], row["id"]) > (created_at, match_id)
+            )
+        else:
+            self.filters.append(
+                lambda row: (row["created_at"], row["id"]) < (created_at, match_id)
+            )
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "FakeQuery":
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "FakeQuery":
+        self.row_limit = count
+        return self
+
+    def range(self, start: int, end: int) -> "FakeQuery":
+        self.row_offset = start
+        self.row_limit = end - start + 1
+        return self
+
+    def execute(self) -> SimpleNamespace:
+        self.client.record(self.table, self.operation)
+        rows = self.client.tables.setdefault(self.table, [])
+
+        if self.operation == "insert":
+            inserted = [self.client.new_row(self.table, row) for row in self.payload]
+            rows.extend(inserted)
+            return SimpleNamespace(data=[dict(row) for row in inserted], count=None)
+
+        if self.operation == "upsert":
+            keys = self.on_conflict.split(",")
+            existing_rows = {tuple(row.get(k) for k in keys): row for row in rows}
+            written = []
+            for new_row in self.payload:
+                existing = existing_rows.get(tuple(new_row.get(k) for k in keys))
+                if existing is None:
+                    rows.append(self.client.new_row(self.table, new_row))
+                    written.append(new_row)
+                elif not self.ignore_duplicates:
+                    existing.update(new_row)
+                    written.append(new_row)
+            # Comme PostgREST, les lignes ignorées ne sont pas renvoyées.
+            return SimpleNamespace(data=[dict(row) for row in written], count=None)
+
+        selected = [row for row in rows if all(check(row) for check in self.filters)]
+
+        if self.operation == "update":
+            for row in selected:
+                row.update(self.payload)
+            return SimpleNamespace(data=[dict(row) for row in selected], count=None)
+
+        for column, desc in reversed(self.orders):
+            selected.sort(key=lambda row: row.get(column), reverse=desc)
+        selected = selected[self.row_offset:]
+        if self.row_limit is not None:
+            selected = selected[:self.row_limit]
+        if self.client.max_rows is not None:
+            selected = selected[:self.client.max_rows]
+        if self.columns and self.columns != ("*",):
+            selected = [{column: row.get(column) for column in self.columns} for row in selected]
+        else:
+            selected = [dict(row) for row in selected]
+        return SimpleNamespace(data=selected, count=len(selected))
+
+
+class FakeClient:
+    """Client Supabase en mémoire comptant les allers-retours."""
+
+    def __init__(self, latency: float = 0.0, max_rows: Optional[int] = None):
+        self.latency = latency
+        self.max_rows = max_rows
+        self.tables: Dict[str, List[Dict]] = {}
+        self.round_trips: Counter = Counter()
+        self._ids = itertools.count(1)
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def record(self, table: str, operation: str) -> None:
+        self.round_trips[f"{table}.{operation}"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def total_round_trips(self) -> int:
+        return sum(self.round_trips.values())
+
+    def new_row(self, table: str, row: Dict) -> Dict:
+        row = dict(row)
+        if table in ("players", "matches"):
+            row.setdefault("id", next(self._ids))
+            self._clock += timedelta(seconds=1)
+            row.setdefault("created_at", self._clock.isoformat())
+        if table == "players":
+            row.setdefault("player_elo", 1000.0)
+        if table == "match_events":
+            row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        return row
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict) -> SimpleNamespace:
+        if name == "save_match":
+            return SimpleNamespace(execute=lambda: self._save_match(params))
+        if name == "discard_match":
+            return SimpleNamespace(execute=lambda: self._discard_match(params))
+        raise NotImplementedError(name)
+
+    def _discard_match(self, params: Dict) -> SimpleNamespace:
+        self.record("rpc", "discard_match")
+        match_id = params["p_match_id"]
+        matches = self.tables.get("matches", [])
+        if any(match["id"] == match_id and not match["is_finished"] for match in matches):
+            self.tables["matches"] = [match for match in matches if match["id"] != match_id]
+            self.tables["match_events"] = [
+                event for event in self.tables.get("match_events", []) if event["match_id"] != match_id
+            ]
+        return SimpleNamespace(data=None)
+
+    def _save_match(self, params: Dict) -> SimpleNamespace:
+        self.record("rpc", "save_match")
+        current_elos = {player["id"]: player["player_elo"] for player in self.tables.get("players", [])}
+        for row in params["p_ranking"]:
+            if abs(current_elos[row["player_id"]] - row["old_elo"]) > ELO_CHECK_TOLERANCE:
+                raise APIError({"code": STALE_ELO_ERROR_CODE, "message": "ELO modifié depuis le calcul du match"})
+        for table, key in (("match_points", "p_points"), ("match_state", "p_state"), ("match_ranking", "p_ranking")):
+            self.tables.setdefault(table, []).extend(dict(row) for row in params[key])
+        new_elos = {row["player_id"]: row["new_elo"] for row in params["p_ranking"]}
+        for player in self.tables.get("players", []):
+            if player["id"] in new_elos:
+                player["player_elo"] = new_elos[player["id"]]
+        stats_by_player = {row["player_id"]: row for row in self.tables.setdefault("player_stats", [])}
+        for increment in params["p_stats"]:
+            current = stats_by_player.get(increment["player_id"])
+            if current is None:
+                self.tables["player_stats"].append(dict(increment))
+                continue
+            for column in PLAYER_STATS_COUNTERS:
+                current[column] += increment[column]
+            current["elo_peak"] = max(current["elo_peak"], increment["elo_peak"])
+        created_at = None
+        for match in self.tables.get("matches", []):
+            if match["id"] == params["p_match_id"]:
+                match["is_finished"] = True
+                match["darts"] = "\\x" + params["p_darts"]
+                created_at = match["created_at"]
+        self.tables["match_events"] = [
+            event for event in self.tables.get("match_events", []) if event["match_id"] != params["p_match_id"]
+        ]
+        return SimpleNamespace(data=created_at)
@@ -0,0 +1,274 @@
+"""
+Benchmarks du moteur de jeu et des chemins de persistance.
+
+Joue des parties aléatoires via CricketGame (throw, return_to_last_state,
+check_end_match, get_df_to_print) sur un client Supabase en mémoire, puis
+mesure l'estimation des probabilités de victoire, state_to_base et le
+chargement de l'historique en comptant les allers-retours. Les résultats sont écrits en JSON pour comparer les versions.
+
+Usage :
+    python -m benchmarks.run [--games 2000] [--seed 0] [--latency-ms 0] [--output bench.json]
+"""
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import streamlit.logger
+from streamlit import config as streamlit_config
+
+from benchmarks.fake_client import FakeClient
+from src.game import CricketGame, GameConfig, load_finished_games
+from src.simulation import get_num_simulations, simulate_win_probabilities
+from src.cache import get_cache
+from src.event_log import get_event_writer
+from src.storage import SupabaseStorage, get_storage, use_storage
+
+PLAYER_NAMES = ["Alice", "Bob", "Carl", "Dana", "Eve", "Fay", "Gus", "Hana"]
+THROW_TARGETS = GameConfig.TARGETS + ["0"]
+UNDO_RATE = 0.05
+MULTI_RATE = 0.3
+HISTORY_PAGE_SIZE = 10
+SIMULATION_PLAYERS = (2, 4, 6)
+SIMULATION_PROGRESS = (0.0, 0.5, 0.9)
+SIMULATION_HIT_RATE = 0.3
+SIMULATION_REPEATS = 5
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Retourne p50/p99/max d'une série de durées, en microsecondes."""
+    values = np.array(samples) * 1e6
+    return {
+        "p50_us": float(np.percentile(values, 50)),
+        "p99_us": float(np.percentile(values, 99)),
+        "max_us": float(values.max()),
+    }
+
+
+def setup_storage(latency: float) -> FakeClient:
+    """Installe un stockage Supabase sur client en mémoire, avec les joueurs de test."""
+    client = FakeClient(latency=latency)
+    client.tables["players"] = [
+        client.new_row("players", {"player_name": name, "player_elo": 1000.0}) for name in PLAYER_NAMES
+    ]
+    use_storage(SupabaseStorage(client))
+    return client
+
+
+def play_game(
+        rng: random.Random,
+        timings: Optional[Dict[str, List[float]]] = None,
+        record_events: bool = True
+) -> CricketGame:
+    """Joue une partie aléatoire complète, en chronométrant chaque opération si demandé."""
+    game = CricketGame(player_list=rng.sample(PLAYER_NAMES, rng.randint(2, 6)), record_events=record_events)
+    clock = time.perf_counter
+
+    while not game.match_ended:
+        if rng.random() < MULTI_RATE:
+            game.set_multi(rng.choice([2, 3]))
+
+        start = clock()
+        game.throw(rng.choice(THROW_TARGETS))
+        thrown = clock()
+        game.check_end_match()
+        checked = clock()
+        game.get_df_to_print()
+        rendered = clock()
+
+        if timings is not None:
+            timings["throw"].append(thrown - start)
+            timings["check_end_match"].append(checked - thrown)
+            timings["get_df_to_print"].append(rendered - checked)
+
+        if not game.match_ended and rng.random() < UNDO_RATE:
+            start = clock()
+            game.return_to_last_state()
+            if timings is not None:
+                timings["return_to_last_state"].append(clock() - start)
+
+    return game
+
+
+def bench_engine(num_games: int, seed: int) -> Dict:
+    """Mesure le débit et la latence par fléchette du moteur de jeu."""
+    rng = random.Random(seed)
+    timings: Dict[str, List[float]] = {
+        "throw": [], "check_end_match": [], "get_df_to_print": [], "return_to_last_state": []
+    }
+
+    start = time.perf_counter()
+    for _ in range(num_games):
+        play_game(rng, timings)
+    elapsed = time.perf_counter() - start
+
+    num_darts = len(timings["throw"])
+    return {
+        "games": num_games,
+        "darts": num_darts,
+        "elapsed_s": elapsed,
+        "darts_per_sec": num_darts / elapsed,
+        "throw_only_darts_per_sec": num_darts / sum(timings["throw"]),
+        "latency": {name: percentiles(samples) for name, samples in timings.items() if samples},
+    }
+
+
+def bench_win_probabilities(seed: int) -> Dict:
+    """
+    Mesure l'estimation des probabilités de victoire (nombre de simulations de
+    get_num_simulations) selon le nombre de joueurs et l'avancement de la partie.
+    Sert à régler STEP_COST et SIMULATION_STEP_COST de src/simulation.py.
+    """
+    rng = random.Random(seed)
+    cases = []
+    for num_players in SIMULATION_PLAYERS:
+        for progress in SIMULATION_PROGRESS:
+            game = CricketGame(player_list=PLAYER_NAMES[:num_players], record_events=False)
+            while game.actual_dart <= progress * game.total_dart_number and not game.match_ended:
+                game.throw(rng.choice(THROW_TARGETS))
+            if game.match_ended:
+                continue
+            remaining_darts = game.total_dart_number - game.actual_dart + 1
+            num_simulations = get_num_simulations(remaining_darts)
+            hit_rates = np.full(num_players, SIMULATION_HIT_RATE)
+            multiplier_probs = np.tile([0.75, 0.15, 0.10], (num_players, 1))
+
+            samples = []
+            for repeat in range(SIMULATION_REPEATS):
+                start = time.perf_counter()
+                simulate_win_probabilities(
+                    game.state, game.points, game.actual_dart, game.total_dart_number,
+                    hit_rates, multiplier_probs, num_simulations, repeat
+                )
+                samples.append(time.perf_counter() - start)
+            cases.append({
+                "players": num_players,
+                "remaining_darts": remaining_darts,
+                "simulations": num_simulations,
+                "elapsed_ms_min": min(samples) * 1e3,
+                "elapsed_ms_median": float(np.median(samples)) * 1e3,
+            })
+    return {"cases": cases}
+
+
+def bench_memory(num_games: int, seed: int) -> Dict:
+    """Mesure le pic mémoire alloué par une session (une partie jouée de bout en bout)."""
+    rng = random.Random(seed)
+    peaks = []
+    retained = []
+
+    get_event_writer().flush()
+    tracemalloc.start()
+    for _ in range(num_games):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        # Sans journal des fléchettes : ses événements s'accumuleraient dans le client en mémoire.
+        game = play_game(rng, record_events=False)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - baseline)
+        retained.append(current - baseline)
+        del game
+    tracemalloc.stop()
+
+    return {
+        "games": num_games,
+        "peak_bytes_mean": float(np.mean(peaks)),
+        "peak_bytes_max": int(np.max(peaks)),
+        "retained_bytes_mean": float(np.mean(retained)),
+    }
+
+
+def bench_persistence(client: FakeClient, num_games: int, seed: int) -> Dict:
+    """Mesure state_to_base et le chargement de l'historique, avec leurs allers-retours."""
+    rng = random.Random(seed)
+    save_timings = []
+    save_round_trips = []
+
+    for _ in range(num_games):
+        game = play_game(rng)
+        # Le journal des fléchettes est écrit en arrière-plan : on le vide pour ne compter que la sauvegarde.
+        get_event_writer().flush()
+        before = client.total_round_trips()
+        start = time.perf_counter()
+        game.state_to_base()
+        save_timings.append(time.perf_counter() - start)
+        save_round_trips.append(client.total_round_trips() - before)
+
+    get_event_writer().flush()
+    client.round_trips.clear()
+    start = time.perf_counter()
+    matches = get_storage().list_finished_matches(HISTORY_PAGE_SIZE)
+    games = load_finished_games([match["id"] for match in matches])
+    for game in games.values():
+        game.get_df_to_print()
+        game.get_ranking_to_print(for_history=True)
+    history_elapsed = time.perf_counter() - start
+
+    return {
+        "state_to_base": {
+            "games": num_games,
+            "round_trips_mean": float(np.mean(save_round_trips)),
+            "latency": percentiles(save_timings),
+        },
+        "history_page": {
+            "matches": len(games),
+            "elapsed_ms": history_elapsed * 1e3,
+            "round_trips": client.total_round_trips(),
+            "round_trips_by_call": dict(client.round_trips),
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks du moteur de jeu et de la persistance.")
+    parser.add_argument("--games", type=int, default=2000, help="Parties jouées pour le moteur")
+    parser.add_argument("--memory-games", type=int, default=200, help="Parties jouées sous tracemalloc")
+    parser.add_argument("--save-games", type=int, default=50, help="Parties enregistrées via state_to_base")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latence simulée par aller-retour")
+    parser.add_argument("--output", default="bench.json")
+    args = parser.parse_args(argv)
+
+    # Mode "bare" : pas de session Streamlit, on masque les avertissements associés.
+    streamlit_config.set_option("logger.level", "error")
+    streamlit.logger.set_log_level("error")
+    client = setup_storage(args.latency_ms / 1e3)
+
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "args": vars(args),
+        "engine": bench_engine(args.games, args.seed),
+        "memory": bench_memory(args.memory_games, args.seed),
+        "win_probabilities": bench_win_probabilities(args.seed),
+        "persistence": bench_persistence(client, args.save_games, args.seed),
+        "cache": get_cache().stats(),
+    }
+    use_storage(None)
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    engine = results["engine"]
+    print(f"Moteur : {engine['darts_per_sec']:.0f} fléchettes/s, "
+          f"throw p50 {engine['latency']['throw']['p50_us']:.1f} µs / p99 {engine['latency']['throw']['p99_us']:.1f} µs")
+    print(f"Mémoire : pic moyen {results['memory']['peak_bytes_mean'] / 1024:.1f} Kio par partie")
+    for case in results["win_probabilities"]["cases"]:
+        print(f"Probabilités de victoire ({case['players']} joueurs, {case['remaining_darts']} fléchettes "
+              f"restantes) : {case['simulations']} simulations, {case['elapsed_ms_median']:.1f} ms")
+    persistence = results["persistence"]
+    print(f"state_to_base : {persistence['state_to_base']['round_trips_mean']:.1f} allers-retours, "
+          f"p50 {persistence['state_to_base']['latency']['p50_us'] / 1e3:.2f} ms")
+    print(f"Historique : {persistence['history_page']['round_trips']} allers-retours, "
+          f"{persistence['history_page']['elapsed_ms']:.1f} ms")
+    print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
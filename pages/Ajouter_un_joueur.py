@@ -1,12 +1,13 @@
 import streamlit as st
-from utils import get_client, get_player_list
+from src.instrumentation import report_db_calls
+from src.storage import get_storage
+from utils import get_player_list, invalidate_roster
 
 st.set_page_config(
     page_title="Ajouter un joueur",
     page_icon="⛹️",
 )
 
-client = get_client()
 player_list = get_player_list()
 
 new_player_name = st.text_input("Nom du joueur", placeholder="Neuil")
@@ -20,9 +21,10 @@ if new_player_name:
         st.error("Ce joueur existe déjà.")
     else:
         try:
-            response = client.table("players").insert(
-                [{"player_name": new_player_name.strip()}], count="None"
-            ).execute()
+            get_storage().add_player(new_player_name.strip())
+            invalidate_roster()
             st.success("Joueur ajouté avec succès.")
         except Exception as e:
             st.error(f"Erreur lors de l'ajout : {e}")
+
+report_db_calls("Ajouter_un_joueur")
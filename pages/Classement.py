@@ -1,17 +1,41 @@
 import streamlit as st
+from src.elo_history import get_elo_chart_data, get_leaderboard_at
+from src.instrumentation import report_db_calls
 from utils import get_leaderbord
 import pandas as pd
+from datetime import datetime, time, timezone
+
+CHART_DEFAULT_PLAYERS = 5
 
 st.set_page_config(
     page_title="Classement",
     page_icon="🏅",
 )
 
-leadeboard_data = get_leaderbord()
+as_of = st.date_input("Classement au", value=None, format="DD/MM/YYYY")
 
-leaderboard = pd.DataFrame(
-    leadeboard_data,
-    index=["🥇", "🥈", "🥉"] + [str(i) for i in range(4, len(leadeboard_data)+1)]
-)
-leaderboard.columns = ["Joueur", "Score"]
-st.dataframe(leaderboard)
\ No newline at end of file
+if as_of is None:
+    leadeboard_data = get_leaderbord()
+else:
+    leadeboard_data = get_leaderboard_at(datetime.combine(as_of, time.max, tzinfo=timezone.utc))
+
+if leadeboard_data:
+    leaderboard = pd.DataFrame(
+        leadeboard_data,
+        index=["🥇", "🥈", "🥉"][:len(leadeboard_data)] + [str(i) for i in range(4, len(leadeboard_data)+1)]
+    )
+    leaderboard.columns = ["Joueur", "Score"]
+    st.dataframe(leaderboard)
+else:
+    st.write("Aucun match joué à cette date.")
+
+st.subheader("Évolution de l'ELO")
+ranked_players = [row["player_name"] for row in get_leaderbord()]
+chart_players = st.multiselect("Joueurs", ranked_players, default=ranked_players[:CHART_DEFAULT_PLAYERS])
+chart_data = get_elo_chart_data(chart_players)
+if chart_data.empty:
+    st.write("Aucun match enregistré pour ces joueurs.")
+else:
+    st.line_chart(chart_data)
+
+report_db_calls("Classement")
@@ -0,0 +1,35 @@
+import streamlit as st
+from src.head_to_head import get_head_to_head
+from src.instrumentation import report_db_calls
+from utils import get_leaderbord, get_player_id
+
+st.set_page_config(
+    page_title="Face à face",
+    page_icon="⚔️",
+)
+
+head_to_head = get_head_to_head()
+ranked_players = [
+    row["player_name"] for row in get_leaderbord()
+    if get_player_id(row["player_name"]) in head_to_head.player_index
+]
+
+if not ranked_players:
+    st.write("Aucun match enregistré.")
+    report_db_calls("Face_a_face")
+    st.stop()
+
+players = st.multiselect("Joueurs", ranked_players, default=ranked_players)
+records, average_elo = head_to_head.to_frames([get_player_id(player) for player in players])
+
+st.subheader("Bilans")
+st.caption("Victoires-défaites-égalités du joueur en ligne contre le joueur en colonne.")
+st.dataframe(records)
+
+st.subheader("ELO échangé")
+st.caption("ELO moyen pris par match par le joueur en ligne au joueur en colonne.")
+st.dataframe(average_elo, column_config={
+    player: st.column_config.NumberColumn(format="%+.2f") for player in average_elo.columns
+})
+
+report_db_calls("Face_a_face")
@@ -1,40 +1,129 @@
 import streamlit as st
-from src.game import CricketGame
-from utils import get_client
-from datetime import datetime
+from src.dart_codec import decode_darts
+from src.export import export_history_archive
+from src.game import CricketGame, GameConfig, load_finished_games
+from src.instrumentation import report_db_calls
+from src.session_memory import enforce_memory_budget
+from src.storage import get_storage
+from utils import get_match_darts, get_player_id, get_player_list
+from datetime import datetime, timedelta
+
+HISTORY_PAGE_SIZE = 10
+ALL_PLAYERS = "Tous"
+MULTIPLIER_PREFIXES = {1: "", 2: "D", 3: "T"}
 
 st.set_page_config(
     page_title="Historique",
     page_icon="🎮",
 )
 
-client = get_client()
-matches = (
-    client
-    .table("matches")
-    .select("id", "created_at")
-    .eq("is_finished", True)
-    .order("created_at", desc=True)
-    .limit(10)
-    .execute()
+text_icons = st.sidebar.toggle("Marques en texte", key="text_icons")
+player_filter = st.sidebar.selectbox("Joueur", [ALL_PLAYERS] + get_player_list())
+period = st.sidebar.date_input("Période", value=(), format="DD/MM/YYYY")
+# Export complet (Parquet), généré seulement au clic.
+st.sidebar.download_button(
+    "Exporter l'historique",
+    data=export_history_archive,
+    file_name="popocricket_historique.zip",
+    mime="application/zip",
 )
 
-for match_info in matches.data:
+filters = {
+    "player_id": None if player_filter == ALL_PLAYERS else get_player_id(player_filter),
+    "since": period[0].isoformat() if len(period) >= 1 else None,
+    "until": (period[1] + timedelta(days=1)).isoformat() if len(period) == 2 else None,
+}
+
+# Pages déjà chargées et détails des matchs ouverts, conservés entre les réexécutions ;
+# la première page est relue à chaque réexécution pour afficher les nouveaux matchs.
+if st.session_state.get("history", {}).get("filters") != filters:
+    st.session_state.history = {"filters": filters, "matches": [], "exhausted": False}
+history = st.session_state.history
+loaded_games = st.session_state.setdefault("history_games", {})
+
+
+def show_replay(match_id: int):
+    """Affiche le rejeu fléchette par fléchette d'un match, à partir de ses fléchettes encodées."""
+    blob = get_match_darts(match_id)
+    if blob is None:
+        st.caption("Fléchettes non enregistrées pour ce match.")
+        return
+
+    player_ids, target_indices, multipliers = decode_darts(blob)
+    num_darts = st.slider("Fléchette", 0, len(target_indices), len(target_indices), key=f"history_replay_dart_{match_id}")
+    game = CricketGame.from_darts(match_id, blob, num_darts)
+
+    if num_darts:
+        thrower = game.player_list[((num_darts - 1) // GameConfig.DARTS_PER_ROUND) % len(player_ids)]
+        target_idx = int(target_indices[num_darts - 1])
+        dart = "Raté" if target_idx == GameConfig.MISS_INDEX else (
+            MULTIPLIER_PREFIXES[int(multipliers[num_darts - 1])] + GameConfig.TARGETS_DISPLAY[target_idx]
+        )
+        st.caption(f"Tour {(num_darts - 1) // (len(player_ids) * GameConfig.DARTS_PER_ROUND) + 1} – {thrower} : {dart}")
+
+    state_df, points_df = game.get_df_to_print(text_icons)
+    st.dataframe(state_df, column_config=game.get_column_config(text_icons))
+    st.dataframe(points_df, hide_index=True)
+
+
+def load_first_page():
+    """
+    Relit la première page pour y trouver les matchs enregistrés depuis le
+    dernier affichage et les place en tête ; les pages suivantes, chargées
+    par curseur, sont conservées. Si aucun match de la première page n'était
+    déjà chargé, la liste repart de cette page.
+    """
+    page = get_storage().list_finished_matches(HISTORY_PAGE_SIZE, None, **filters)
+    loaded_ids = {match["id"] for match in history["matches"]}
+    new_matches = [match for match in page if match["id"] not in loaded_ids]
+    if len(new_matches) == len(page):
+        history["matches"] = page
+        history["exhausted"] = len(page) < HISTORY_PAGE_SIZE
+    else:
+        history["matches"][:0] = new_matches
+
+
+def load_next_page():
+    """Charge la page suivante de matchs, à partir de la dernière ligne déjà chargée."""
+    matches = history["matches"]
+    cursor = (matches[-1]["created_at"], matches[-1]["id"]) if matches else None
+    page = get_storage().list_finished_matches(HISTORY_PAGE_SIZE, cursor, **filters)
+    matches.extend(page)
+    history["exhausted"] = len(page) < HISTORY_PAGE_SIZE
+
+
+load_first_page()
+
+# Détails des matchs ouverts depuis la dernière réexécution, chargés en une fois ;
+# les matchs refermés sont libérés si la session dépasse son plafond mémoire.
+opened = [
+    match_info["id"] for match_info in history["matches"]
+    if st.session_state.get(f"history_details_{match_info['id']}")
+]
+loaded_games.update(load_finished_games([match_id for match_id in opened if match_id not in loaded_games]))
+enforce_memory_budget(loaded_games, keep=opened)
+
+if not history["matches"]:
+    st.write("Aucun match.")
+
+for match_info in history["matches"]:
 
-    match = match_info["id"]
     date = datetime.fromisoformat(match_info['created_at'])
 
-    st.write(f"Date: {date.strftime('%d/%m/%Y %H:%M')}")
-
-    match = CricketGame(match_id=match)
-    state_df, points_df = match.get_df_to_print()
-    st.dataframe(
-        state_df,
-        column_config={
-            player: st.column_config.ImageColumn(player)
-            for player in match.player_list
-        },
-    )
+    if not st.toggle(f"{date.strftime('%d/%m/%Y %H:%M')}", key=f"history_details_{match_info['id']}"):
+        continue
+
+    match = loaded_games[match_info["id"]]
+    state_df, points_df = match.get_df_to_print(text_icons)
+    st.dataframe(state_df, column_config=match.get_column_config(text_icons))
     st.dataframe(points_df, hide_index=True)
 
-    st.markdown(match.get_ranking_to_print(for_history=True), unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown(match.get_ranking_to_print(for_history=True), unsafe_allow_html=True)
+
+    if st.toggle("Rejouer le match", key=f"history_replay_{match_info['id']}"):
+        show_replay(match_info["id"])
+
+if not history["exhausted"]:
+    st.button("Charger plus", on_click=load_next_page)
+
+report_db_calls("Historique")
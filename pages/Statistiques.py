@@ -0,0 +1,44 @@
+import streamlit as st
+from src.game import GameConfig
+from src.instrumentation import report_db_calls
+from src.stats import get_player_stats
+import pandas as pd
+
+st.set_page_config(
+    page_title="Statistiques",
+    page_icon="📊",
+)
+
+stats_data = get_player_stats()
+
+if not stats_data:
+    st.write("Aucun match enregistré.")
+    report_db_calls("Statistiques")
+    st.stop()
+
+stats = pd.DataFrame(stats_data).set_index("player_name").sort_values("games", ascending=False)
+games = stats["games"]
+
+table = pd.DataFrame({
+    "Parties": games,
+    "Victoires": stats["wins"],
+    "% victoires": 100 * stats["wins"] / games,
+    "Points encaissés / partie": stats["points_conceded"] / games,
+    "ELO max": stats["elo_peak"],
+})
+for target, target_display in zip(GameConfig.TARGETS, GameConfig.TARGETS_DISPLAY):
+    table[f"Fermé {target_display}"] = 100 * stats[f"closed_{target}"] / games
+table.index.name = "Joueur"
+
+percent_format = st.column_config.NumberColumn(format="%.0f %%")
+st.dataframe(
+    table,
+    column_config={
+        "% victoires": percent_format,
+        "Points encaissés / partie": st.column_config.NumberColumn(format="%.1f"),
+        "ELO max": st.column_config.NumberColumn(format="%.2f"),
+        **{f"Fermé {target_display}": percent_format for target_display in GameConfig.TARGETS_DISPLAY},
+    }
+)
+
+report_db_calls("Statistiques")
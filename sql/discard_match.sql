@@ -0,0 +1,23 @@
+-- Abandon d'un match non terminé.
+--
+-- Appelée depuis la reprise des parties interrompues via
+-- client.rpc("discard_match", ...). Supprime, dans une seule transaction, le
+-- journal de fléchettes du match (voir match_events.sql) puis le match
+-- lui-même. Sans effet sur un match terminé.
+
+create or replace function public.discard_match(p_match_id bigint) returns void
+language plpgsql
+as $$
+begin
+    perform 1 from public.matches
+    where id = p_match_id and not is_finished
+    for update;
+
+    if not found then
+        return;
+    end if;
+
+    delete from public.match_events where match_id = p_match_id;
+    delete from public.matches where id = p_match_id;
+end;
+$$;
@@ -0,0 +1,8 @@
+-- Fléchettes encodées des matchs terminés.
+--
+-- Écrite par save_match (voir save_match.sql) et relue pour rejouer un match
+-- dans l'historique. Voir src/dart_codec.py pour le format (un octet par
+-- fléchette après un en-tête avec les joueurs). Null pour les matchs
+-- enregistrés avant cette colonne.
+
+alter table public.matches add column if not exists darts bytea;
@@ -0,0 +1,26 @@
+-- Journal des fléchettes des matchs en cours.
+--
+-- Alimenté en arrière-plan par src/event_log.py (un insert par lot) et relu
+-- pour reprendre un match non terminé. Voir src/event_log.py pour les types
+-- d'événements (event) et la signification de value. created_at date chaque
+-- événement : un match ayant reçu des fléchettes récemment est sans doute
+-- encore joué sur un autre appareil et n'est pas proposé à la reprise.
+
+create table if not exists public.match_events (
+    match_id bigint not null references public.matches (id),
+    seq integer not null,
+    event smallint not null,
+    value integer not null,
+    created_at timestamptz not null default now(),
+    primary key (match_id, seq)
+);
+
+alter table public.match_events add column if not exists created_at timestamptz not null default now();
+
+-- value contient l'ID du joueur pour les événements EVENT_PLAYER : smallint
+-- dans les premières versions de la table.
+alter table public.match_events alter column value type integer;
+
+create index if not exists matches_unfinished_created_at_idx
+    on public.matches (created_at desc, id desc)
+    where not is_finished;
@@ -0,0 +1,20 @@
+-- Statistiques agrégées par joueur.
+--
+-- Mises à jour de façon incrémentale par save_match (voir save_match.sql) et
+-- reconstruites en entier par `python -m src.stats`. Les compteurs sont des
+-- sommes sur les matchs terminés ; elo_peak est le plus haut new_elo atteint.
+
+create table if not exists public.player_stats (
+    player_id bigint primary key references public.players (id),
+    games integer not null default 0,
+    wins integer not null default 0,
+    points_conceded integer not null default 0,
+    closed_20 integer not null default 0,
+    closed_19 integer not null default 0,
+    closed_18 integer not null default 0,
+    closed_17 integer not null default 0,
+    closed_16 integer not null default 0,
+    closed_15 integer not null default 0,
+    closed_25 integer not null default 0,
+    elo_peak double precision
+);
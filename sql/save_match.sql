@@ -0,0 +1,111 @@
+-- Enregistrement atomique d'un match terminé.
+--
+-- Appelée par CricketGame.state_to_base via client.rpc("save_match", ...).
+-- Toute la fonction s'exécute dans une seule transaction : soit le match est
+-- entièrement enregistré (points, état, classement, fin du match, fléchettes,
+-- nouveaux ELO, statistiques des joueurs), soit rien ne l'est. Le journal des
+-- fléchettes du match (match_events), remplacé par matches.darts, est supprimé
+-- dans la même transaction.
+--
+-- Les lignes des joueurs sont verrouillées et leur ELO comparé à l'old_elo du
+-- classement : s'il a changé depuis le calcul du match (autre processus,
+-- correction manuelle, elo_replay --write, autre match enregistré entre-temps),
+-- la fonction lève l'erreur PT409 et l'application recalcule le match avec les
+-- ELO à jour.
+--
+-- Retourne matches.created_at, la date du match dans l'historique ELO.
+--
+-- Nécessite la table player_stats (voir player_stats.sql) et la colonne
+-- matches.darts (voir match_darts.sql). Les anciennes versions doivent être
+-- supprimées (la dernière retournait void) :
+--     drop function if exists public.save_match(bigint, jsonb, jsonb, jsonb);
+--     drop function if exists public.save_match(bigint, jsonb, jsonb, jsonb, jsonb);
+--     drop function if exists public.save_match(bigint, jsonb, jsonb, jsonb, jsonb, text);
+
+create or replace function public.save_match(
+    p_match_id bigint,
+    p_points jsonb,
+    p_state jsonb,
+    p_ranking jsonb,
+    p_stats jsonb,
+    p_darts text
+) returns timestamptz
+language plpgsql
+as $$
+declare
+    v_created_at timestamptz;
+begin
+    perform 1 from public.matches
+    where id = p_match_id and not is_finished
+    for update;
+
+    if not found then
+        raise exception 'Match % introuvable ou déjà enregistré', p_match_id;
+    end if;
+
+    perform 1 from public.players
+    where id in (select player_id from jsonb_populate_recordset(null::public.match_ranking, p_ranking))
+    order by id
+    for update;
+
+    if exists (
+        select 1
+        from public.players as p
+        join jsonb_populate_recordset(null::public.match_ranking, p_ranking) as r on p.id = r.player_id
+        where abs(p.player_elo - r.old_elo) > 1e-3
+    ) then
+        raise exception 'ELO modifié depuis le calcul du match %', p_match_id
+            using errcode = 'PT409';
+    end if;
+
+    insert into public.match_points (match_id, player_id, points)
+    select match_id, player_id, points
+    from jsonb_populate_recordset(null::public.match_points, p_points);
+
+    insert into public.match_state (match_id, player_id, target, score)
+    select match_id, player_id, target, score
+    from jsonb_populate_recordset(null::public.match_state, p_state);
+
+    insert into public.match_ranking (match_id, player_id, rank, old_elo, new_elo, delta_elo)
+    select match_id, player_id, rank, old_elo, new_elo, delta_elo
+    from jsonb_populate_recordset(null::public.match_ranking, p_ranking);
+
+    update public.players as p
+    set player_elo = r.new_elo
+    from jsonb_populate_recordset(null::public.match_ranking, p_ranking) as r
+    where p.id = r.player_id;
+
+    insert into public.player_stats as s (
+        player_id, games, wins, points_conceded,
+        closed_20, closed_19, closed_18, closed_17, closed_16, closed_15, closed_25,
+        elo_peak
+    )
+    select
+        player_id, games, wins, points_conceded,
+        closed_20, closed_19, closed_18, closed_17, closed_16, closed_15, closed_25,
+        elo_peak
+    from jsonb_populate_recordset(null::public.player_stats, p_stats)
+    on conflict (player_id) do update set
+        games = s.games + excluded.games,
+        wins = s.wins + excluded.wins,
+        points_conceded = s.points_conceded + excluded.points_conceded,
+        closed_20 = s.closed_20 + excluded.closed_20,
+        closed_19 = s.closed_19 + excluded.closed_19,
+        closed_18 = s.closed_18 + excluded.closed_18,
+        closed_17 = s.closed_17 + excluded.closed_17,
+        closed_16 = s.closed_16 + excluded.closed_16,
+        closed_15 = s.closed_15 + excluded.closed_15,
+        closed_25 = s.closed_25 + excluded.closed_25,
+        elo_peak = greatest(s.elo_peak, excluded.elo_peak);
+
+    update public.matches
+    set is_finished = true,
+        darts = decode(p_darts, 'hex')
+    where id = p_match_id
+    returning created_at into v_created_at;
+
+    delete from public.match_events where match_id = p_match_id;
+
+    return v_created_at;
+end;
+$$;
@@ -0,0 +1,39 @@
+"""Ressources statiques de l'application, chargées une seule fois par processus."""
+import base64
+from pathlib import Path
+from typing import Dict
+
+import streamlit as st
+
+ASSETS_DIR = Path(__file__).resolve().parent.parent / "assets"
+DART_IMAGE = "dart.png"
+
+# Icônes des marques par cible (0 à 3), embarquées dans l'application
+# pour que le tableau de score ne fasse aucune requête externe.
+ICON_FILES = {
+    0: "icons/blank.svg",
+    1: "icons/simple.svg",
+    2: "icons/double.svg",
+    3: "icons/triple.svg",
+}
+ICON_TEXT = {0: "", 1: "/", 2: "X", 3: "Ⓧ"}
+
+
+@st.cache_resource
+def load_asset(name: str) -> bytes:
+    """Retourne le contenu d'un fichier du dossier assets."""
+    return (ASSETS_DIR / name).read_bytes()
+
+
+def get_dart_image() -> bytes:
+    """Retourne l'image de fléchette affichée pour les lancers restants."""
+    return load_asset(DART_IMAGE)
+
+
+@st.cache_resource
+def get_icon_data_uris() -> Dict[int, str]:
+    """Retourne les icônes des marques encodées en data URI, une seule fois par processus."""
+    return {
+        score: "data:image/svg+xml;base64," + base64.b64encode(load_asset(name)).decode("ascii")
+        for score, name in ICON_FILES.items()
+    }
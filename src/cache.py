@@ -0,0 +1,201 @@
+"""
+Cache applicatif avec durée de vie et invalidation par étiquettes.
+
+Chaque entrée porte des étiquettes (ROSTER, LEADERBOARD, ...) ; les écritures
+en base invalident précisément les étiquettes concernées plutôt que de vider
+tous les caches. Des compteurs de hits/misses par espace de noms permettent
+de vérifier le fonctionnement du cache.
+"""
+import functools
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Hashable, Iterable, Set, Tuple
+
+import streamlit as st
+
+ROSTER = "roster"
+LEADERBOARD = "leaderboard"
+PLAYER_ELO = "player_elo"
+PLAYER_STATS = "player_stats"
+ELO_HISTORY = "elo_history"
+HEAD_TO_HEAD = "head_to_head"
+
+
+def match_ranking_tag(match_id: int) -> str:
+    """Étiquette du classement enregistré d'un match."""
+    return f"match_ranking:{match_id}"
+
+
+def player_history_tag(player_id: int) -> str:
+    """Étiquette des données dérivées des derniers matchs d'un joueur."""
+    return f"player_history:{player_id}"
+
+
+class TaggedCache:
+    """
+    Cache clé/valeur avec durée de vie (TTL) et invalidation par étiquettes.
+
+    Une valeur chargée pendant qu'une de ses étiquettes est invalidée n'est
+    pas conservée, pour ne jamais remettre en cache une donnée périmée.
+    Les valeurs None ne sont pas mises en cache.
+
+    Les entrées expirées sont supprimées à l'accès et, au plus toutes les
+    SWEEP_INTERVAL secondes, lors d'un ajout ; les étiquettes sans entrée ni
+    chargement en cours ne sont pas conservées. La mémoire reste ainsi
+    bornée par les entrées valides, même avec des étiquettes par match.
+    """
+
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[float, Any, Tuple[str, ...]]] = {}
+        self._keys_by_tag: Dict[str, Set[Hashable]] = defaultdict(set)
+        # Générations des étiquettes ayant un chargement en cours (_loading).
+        self._generations: Counter = Counter()
+        self._loading: Counter = Counter()
+        self._next_sweep = time.monotonic() + self.SWEEP_INTERVAL
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    def get_or_load(
+            self,
+            namespace: str,
+            key: Hashable,
+            loader: Callable[[], Any],
+            ttl: float,
+            tags: Iterable[str] = ()
+    ) -> Any:
+        """
+        Retourne la valeur en cache, ou la charge avec loader si absente ou expirée.
+
+        Args:
+            namespace: Espace de noms (utilisé pour la clé et les compteurs)
+            key: Clé de l'entrée dans l'espace de noms
+            loader: Fonction de chargement appelée en cas de miss
+            ttl: Durée de vie en secondes
+            tags: Étiquettes d'invalidation de l'entrée
+        """
+        full_key = (namespace, key)
+        tags = tuple(tags)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] > now:
+                self.hits[namespace] += 1
+                return entry[1]
+            if entry is not None:
+                self._evict(full_key)
+            self.misses[namespace] += 1
+            generations = [self._generations[tag] for tag in tags]
+            self._loading.update(tags)
+
+        value = None
+        try:
+            value = loader()
+        finally:
+            with self._lock:
+                still_valid = all(self._generations[tag] == gen for tag, gen in zip(tags, generations))
+                self._end_loading(tags)
+                if value is not None and still_valid:
+                    self._evict(full_key)
+                    self._entries[full_key] = (now + ttl, value, tags)
+                    for tag in tags:
+                        self._keys_by_tag[tag].add(full_key)
+                    if now >= self._next_sweep:
+                        self._sweep(now)
+        return value
+
+    def peek(self, namespace: str, key: Hashable) -> Any:
+        """Retourne la valeur en cache si elle est présente et valide, sans la charger ; None sinon."""
+        full_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                return None
+            if entry[0] > time.monotonic():
+                return entry[1]
+            self._evict(full_key)
+        return None
+
+    def invalidate(self, *tags: str) -> None:
+        """Supprime toutes les entrées portant l'une des étiquettes données."""
+        with self._lock:
+            for tag in tags:
+                if tag in self._loading:
+                    self._generations[tag] += 1
+                for full_key in list(self._keys_by_tag.get(tag, ())):
+                    self._evict(full_key)
+
+    def clear(self) -> None:
+        """Vide entièrement le cache (changement de stockage)."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            for tag in self._loading:
+                self._generations[tag] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Retourne les compteurs {espace de noms: {hits, misses}}."""
+        with self._lock:
+            return {
+                namespace: {"hits": self.hits[namespace], "misses": self.misses[namespace]}
+                for namespace in sorted(set(self.hits) | set(self.misses))
+            }
+
+    def _evict(self, full_key: Hashable) -> None:
+        """Supprime une entrée et la retire de l'index de ses étiquettes (verrou tenu)."""
+        entry = self._entries.pop(full_key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(full_key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def _end_loading(self, tags: Tuple[str, ...]) -> None:
+        """Termine un chargement ; oublie la génération des étiquettes qui n'en ont plus (verrou tenu)."""
+        self._loading.subtract(tags)
+        for tag in tags:
+            if self._loading[tag] <= 0:
+                self._loading.pop(tag, None)
+                self._generations.pop(tag, None)
+
+    def _sweep(self, now: float) -> None:
+        """Supprime toutes les entrées expirées (verrou tenu)."""
+        for full_key in [full_key for full_key, entry in self._entries.items() if entry[0] <= now]:
+            self._evict(full_key)
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+
+@st.cache_resource
+def get_cache() -> TaggedCache:
+    """Retourne le cache applicatif partagé par le processus."""
+    return TaggedCache()
+
+
+def cached(namespace: str, ttl: float, tags: Callable[..., Iterable[str]]):
+    """
+    Décorateur mettant en cache le résultat d'une fonction dans le cache applicatif.
+
+    Args:
+        namespace: Espace de noms des entrées
+        ttl: Durée de vie en secondes
+        tags: Fonction des arguments retournant les étiquettes de l'entrée
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args):
+            return get_cache().get_or_load(
+                namespace,
+                args,
+                lambda: function(*args),
+                ttl,
+                tags(*args),
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,72 @@
+"""
+Encodage binaire compact de la séquence des fléchettes d'un match.
+
+Un match terminé est enregistré avec ses fléchettes effectives (celles qui
+restent après les annulations) dans la colonne matches.darts :
+
+    octet 0              version du format (DARTS_FORMAT_VERSION)
+    octet 1              nombre de joueurs P
+    4 × P octets         IDs des joueurs dans l'ordre de jeu (uint32 little-endian)
+    1 octet / fléchette  bits 0-2 : index de la cible + 1 (0 pour un raté)
+                         bits 3-4 : multiplicateur (1 à 3)
+
+Un match à deux joueurs (20 tours, au plus 120 fléchettes) tient en au plus
+130 octets. Le décodage est vectorisé (np.frombuffer) ; CricketGame.from_darts
+rejoue les fléchettes pour reconstruire l'état final ou n'importe quel état
+intermédiaire.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+DARTS_FORMAT_VERSION = 1
+HEADER_SIZE = 2
+PLAYER_ID_DTYPE = np.dtype("<u4")
+TARGET_MASK = 0b111
+MULTI_SHIFT = 3
+
+
+def encode_darts(player_ids: List[int], target_indices: np.ndarray, multipliers: np.ndarray) -> bytes:
+    """
+    Encode la séquence des fléchettes d'un match.
+
+    Args:
+        player_ids: IDs des joueurs dans l'ordre de jeu
+        target_indices: Index de la cible de chaque fléchette (-1 pour un raté)
+        multipliers: Multiplicateur de chaque fléchette
+
+    Returns:
+        Blob binaire (voir le format en tête de module)
+    """
+    header = bytes((DARTS_FORMAT_VERSION, len(player_ids)))
+    darts = (np.asarray(target_indices, dtype=np.int16) + 1) | (np.asarray(multipliers, dtype=np.int16) << MULTI_SHIFT)
+    return (
+        header
+        + np.asarray(player_ids, dtype=PLAYER_ID_DTYPE).tobytes()
+        + darts.astype(np.uint8).tobytes()
+    )
+
+
+def decode_darts(blob: bytes) -> Tuple[List[int], np.ndarray, np.ndarray]:
+    """
+    Décode la séquence des fléchettes d'un match.
+
+    Args:
+        blob: Blob produit par encode_darts
+
+    Returns:
+        Tuple (IDs des joueurs dans l'ordre de jeu, index des cibles (-1 pour
+        un raté), multiplicateurs), les deux derniers en tableaux int8
+
+    Raises:
+        ValueError: Si le blob n'est pas dans un format connu
+    """
+    if len(blob) < HEADER_SIZE or blob[0] != DARTS_FORMAT_VERSION:
+        raise ValueError("Format de fléchettes inconnu")
+    num_players = blob[1]
+    darts_offset = HEADER_SIZE + num_players * PLAYER_ID_DTYPE.itemsize
+    player_ids = np.frombuffer(blob, dtype=PLAYER_ID_DTYPE, count=num_players, offset=HEADER_SIZE)
+    darts = np.frombuffer(blob, dtype=np.uint8, offset=darts_offset)
+    target_indices = (darts & TARGET_MASK).astype(np.int8) - 1
+    multipliers = (darts >> MULTI_SHIFT).astype(np.int8)
+    return player_ids.tolist(), target_indices, multipliers
@@ -0,0 +1,163 @@
+"""
+Historique des ELO des joueurs, pour les courbes et le classement à une date.
+
+L'historique est construit une fois à partir de match_ranking.new_elo
+(matchs terminés parcourus page par page) puis gardé dans le cache
+applicatif : une série par joueur, deux tableaux NumPy triés par date
+(dates en secondes et ELO après chaque match). Chaque match enregistré y est
+ajouté sur place (record_match_elos), sans relire la base.
+
+Le classement à une date donnée est une recherche dichotomique par joueur
+(np.searchsorted) dans ces séries.
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.cache import ELO_HISTORY, cached, get_cache
+from src.elo_replay import DEFAULT_PAGE_SIZE, iter_finished_matches
+from src.storage import get_storage
+from utils import get_player_directory
+
+ELO_HISTORY_TTL = 24 * 3600
+TIME_UNIT = "datetime64[s]"
+
+
+def to_datetime64(value: datetime) -> np.datetime64:
+    """Convertit une date (naïve = UTC) en np.datetime64 UTC à la seconde."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, "s")
+
+
+class EloHistory:
+    """
+    Séries ELO de tous les joueurs.
+
+    Pour chaque joueur, times[i] est la date du i-ème match (matches.created_at)
+    et elos[i] son ELO après ce match, en float32 (arrondi au centième en sortie).
+    Les lectures et record prennent le verrou : une série n'est jamais lue
+    entre la mise à jour de ses dates et celle de ses ELO.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.times: Dict[int, np.ndarray] = {}
+        self.elos: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def load(cls, page_size: int = DEFAULT_PAGE_SIZE) -> "EloHistory":
+        """Construit l'historique à partir de tous les matchs terminés (deux requêtes par page)."""
+        times: Dict[int, List[np.datetime64]] = {}
+        elos: Dict[int, List[float]] = {}
+        for match, rows in iter_finished_matches(get_storage(), page_size):
+            match_time = to_datetime64(datetime.fromisoformat(match["created_at"]))
+            for row in rows:
+                player_id = int(row["player_id"])
+                times.setdefault(player_id, []).append(match_time)
+                elos.setdefault(player_id, []).append(float(row["new_elo"]))
+
+        history = cls()
+        for player_id in times:
+            history.times[player_id] = np.array(times[player_id], dtype=TIME_UNIT)
+            history.elos[player_id] = np.array(elos[player_id], dtype=np.float32)
+        return history
+
+    def record(self, when: np.datetime64, elos_by_id: Dict[int, float]) -> None:
+        """Ajoute les ELO d'un match, en gardant chaque série triée par date."""
+        with self._lock:
+            for player_id, elo in elos_by_id.items():
+                player_id = int(player_id)
+                times = self.times.get(player_id, np.array([], dtype=TIME_UNIT))
+                position = np.searchsorted(times, when, side="right")
+                self.times[player_id] = np.insert(times, position, when)
+                self.elos[player_id] = np.insert(
+                    self.elos.get(player_id, np.array([], dtype=np.float32)), position, elo
+                )
+
+    def elos_at(self, when: np.datetime64) -> Dict[int, float]:
+        """
+        Retourne l'ELO de chaque joueur à une date donnée.
+
+        Args:
+            when: Date (incluse) du classement
+
+        Returns:
+            Dictionnaire {player_id: ELO après son dernier match avant when},
+            sans les joueurs n'ayant pas encore joué
+        """
+        result = {}
+        with self._lock:
+            for player_id, times in self.times.items():
+                index = np.searchsorted(times, when, side="right") - 1
+                if index >= 0:
+                    result[player_id] = round(float(self.elos[player_id][index]), 2)
+        return result
+
+    def series(self, player_id: int) -> pd.Series:
+        """Retourne la série ELO d'un joueur, indexée par date."""
+        with self._lock:
+            elos = self.elos.get(player_id, np.array([], dtype=np.float32))
+            times = self.times.get(player_id, np.array([], dtype=TIME_UNIT))
+        return pd.Series(elos.astype(np.float64).round(2), index=pd.DatetimeIndex(times))
+
+    def memory_size(self) -> int:
+        """Taille des tableaux de l'historique, en octets."""
+        with self._lock:
+            return sum(array.nbytes for array in self.times.values()) + sum(array.nbytes for array in self.elos.values())
+
+
+@cached("elo_history", ELO_HISTORY_TTL, tags=lambda: (ELO_HISTORY,))
+def get_elo_history() -> EloHistory:
+    """Retourne l'historique ELO partagé par le processus."""
+    return EloHistory.load()
+
+
+def record_match_elos(elos_by_id: Dict[int, float], when: datetime) -> None:
+    """
+    Ajoute les nouveaux ELO d'un match enregistré à l'historique en cache.
+
+    Sans effet si l'historique n'est pas chargé : il sera construit depuis
+    la base, match compris, au prochain affichage.
+
+    Args:
+        elos_by_id: Nouveaux ELO {player_id: ELO}
+        when: Date du match (matches.created_at, comme au chargement)
+    """
+    history = get_cache().peek("elo_history", ())
+    if history is not None:
+        history.record(to_datetime64(when), elos_by_id)
+
+
+def get_leaderboard_at(when: datetime) -> List[Dict]:
+    """
+    Retourne le classement ELO à une date, au format de get_leaderbord.
+
+    Args:
+        when: Date du classement ; les joueurs n'ayant pas joué avant en sont absents
+    """
+    directory = get_player_directory()
+    leaderboard = [
+        {"player_name": directory.get_name(player_id), "player_elo": elo}
+        for player_id, elo in get_elo_history().elos_at(to_datetime64(when)).items()
+    ]
+    return sorted(leaderboard, key=lambda row: row["player_elo"], reverse=True)
+
+
+def get_elo_chart_data(player_names: List[str]) -> pd.DataFrame:
+    """
+    Retourne les courbes ELO de plusieurs joueurs, une colonne par joueur.
+
+    Les dates sont celles de tous leurs matchs ; entre deux matchs d'un
+    joueur, son ELO est prolongé.
+    """
+    directory = get_player_directory()
+    history = get_elo_history()
+    series = {name: history.series(directory.get_id(name)) for name in player_names}
+    series = {name: serie.groupby(level=0).last() for name, serie in series.items() if not serie.empty}
+    if not series:
+        return pd.DataFrame()
+    return pd.DataFrame(series).sort_index().ffill()
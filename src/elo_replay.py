@@ -0,0 +1,191 @@
+"""
+Rejeu complet du classement ELO à partir de match_ranking.
+
+Parcourt les matchs terminés par ordre de created_at, page par page, en
+réappliquant en mémoire les règles de calcul_delta_elo. Signale les écarts
+avec les old_elo/new_elo enregistrés et peut réécrire les ELO corrigés.
+
+Les ELO réécrits (--write) ne sont vus par une application déjà lancée
+qu'au rechargement de son annuaire des joueurs (au plus ROSTER_TTL, ou en
+la redémarrant). Les matchs enregistrés entre-temps ne les écrasent pas :
+save_match refuse des ELO de départ périmés et l'application recalcule le
+match avec les ELO à jour.
+
+Usage :
+    python -m src.elo_replay [--page-size 100] [--initial-elo 1000] [--write]
+"""
+import argparse
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.storage import Storage, get_storage, iter_finished_match_pages
+from utils import ROSTER_TTL, get_player_directory, compute_elo_deltas
+
+DEFAULT_PAGE_SIZE = 100
+ELO_TOLERANCE = 0.01
+MAX_REPORTED_DRIFTS = 50
+
+
+@dataclass
+class EloDrift:
+    """Écart entre l'ELO enregistré et l'ELO rejoué pour un joueur sur un match."""
+    match_id: int
+    player_id: int
+    stored_old_elo: float
+    replayed_old_elo: float
+    stored_new_elo: float
+    replayed_new_elo: float
+
+
+@dataclass
+class ReplayReport:
+    """Résultat d'un rejeu : ELO finaux et écarts constatés."""
+    ratings: Dict[int, float] = field(default_factory=dict)
+    num_matches: int = 0
+    num_drifts: int = 0
+    max_drift: float = 0.0
+    drifts: List[EloDrift] = field(default_factory=list)
+
+
+def iter_finished_matches(
+        storage: Storage,
+        page_size: int = DEFAULT_PAGE_SIZE
+) -> Iterator[Tuple[Dict, List[Dict]]]:
+    """
+    Itère sur les matchs terminés par ordre chronologique, avec leur classement.
+    
+    Chaque page coûte deux requêtes (matches puis match_ranking),
+    et seule la page courante est gardée en mémoire.
+
+    Args:
+        storage: Stockage à parcourir
+        page_size: Nombre de matchs par page
+
+    Yields:
+        Tuple (ligne matches, lignes match_ranking du match)
+    """
+    for matches in iter_finished_match_pages(storage, page_size):
+        match_ids = [match["id"] for match in matches]
+        ranking_rows = storage.get_match_ranking(match_ids)
+        rows_by_match: Dict[int, List[Dict]] = {match_id: [] for match_id in match_ids}
+        for row in ranking_rows:
+            rows_by_match[int(row["match_id"])].append(row)
+
+        for match in matches:
+            yield match, rows_by_match[match["id"]]
+
+
+def replay_elo(
+        storage: Storage,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        initial_elo: Optional[float] = None
+) -> ReplayReport:
+    """
+    Rejoue tous les matchs terminés et compare avec les ELO enregistrés.
+    
+    Args:
+        storage: Stockage à parcourir
+        page_size: Nombre de matchs lus par page
+        initial_elo: ELO de départ des joueurs ; par défaut, l'old_elo
+            enregistré lors de leur premier match
+
+    Returns:
+        Rapport du rejeu
+    """
+    report = ReplayReport()
+    ratings = report.ratings
+
+    for match, rows in iter_finished_matches(storage, page_size):
+        if len(rows) < 2:
+            continue
+        report.num_matches += 1
+
+        player_ids = [int(row["player_id"]) for row in rows]
+        for player_id, row in zip(player_ids, rows):
+            if player_id not in ratings:
+                ratings[player_id] = float(row["old_elo"]) if initial_elo is None else initial_elo
+
+        old_elos = np.array([ratings[player_id] for player_id in player_ids])
+        ranks = np.array([int(row["rank"]) for row in rows])
+        deltas = compute_elo_deltas(old_elos, ranks)
+
+        for player_id, row, old_elo, delta in zip(player_ids, rows, old_elos, deltas):
+            new_elo = float(old_elo) + round(float(delta), 2)
+            ratings[player_id] = new_elo
+
+            drift = max(abs(float(row["old_elo"]) - old_elo), abs(float(row["new_elo"]) - new_elo))
+            if drift > ELO_TOLERANCE:
+                report.num_drifts += 1
+                report.max_drift = max(report.max_drift, drift)
+                if len(report.drifts) < MAX_REPORTED_DRIFTS:
+                    report.drifts.append(EloDrift(
+                        match_id=match["id"],
+                        player_id=player_id,
+                        stored_old_elo=float(row["old_elo"]),
+                        replayed_old_elo=float(old_elo),
+                        stored_new_elo=float(row["new_elo"]),
+                        replayed_new_elo=new_elo,
+                    ))
+
+    return report
+
+
+def get_rating_corrections(ratings: Dict[int, float]) -> Dict[int, float]:
+    """Retourne les ELO rejoués qui diffèrent de ceux enregistrés dans players."""
+    directory = get_player_directory()
+    return {
+        player_id: elo
+        for player_id, elo in ratings.items()
+        if directory.elo_by_id.get(player_id) is None
+        or abs(directory.elo_by_id[player_id] - elo) > ELO_TOLERANCE
+    }
+
+
+def write_ratings(storage: Storage, ratings: Dict[int, float]) -> None:
+    """Réécrit en une seule requête les ELO des joueurs donnés."""
+    if not ratings:
+        return
+    directory = get_player_directory()
+    storage.update_player_elos([
+        {"id": player_id, "player_name": directory.get_name(player_id), "player_elo": elo}
+        for player_id, elo in ratings.items()
+    ])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rejoue et vérifie le classement ELO.")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--initial-elo", type=float, default=None)
+    parser.add_argument("--write", action="store_true", help=(
+        "Réécrit les ELO corrigés dans players ; une application lancée les affiche "
+        f"au rechargement de son annuaire ({ROSTER_TTL // 60} min au plus) ou après redémarrage"
+    ))
+    args = parser.parse_args(argv)
+
+    storage = get_storage()
+    report = replay_elo(storage, args.page_size, args.initial_elo)
+
+    print(f"Matchs rejoués : {report.num_matches}")
+    print(f"Écarts : {report.num_drifts} (max {report.max_drift:.2f})")
+    for drift in report.drifts:
+        print(
+            f"  match {drift.match_id} joueur {drift.player_id} : "
+            f"{drift.stored_old_elo} -> {drift.stored_new_elo} enregistré, "
+            f"{drift.replayed_old_elo} -> {drift.replayed_new_elo} rejoué"
+        )
+
+    corrections = get_rating_corrections(report.ratings)
+    directory = get_player_directory()
+    print(f"ELO à corriger : {len(corrections)}")
+    for player_id, elo in corrections.items():
+        print(f"  {directory.get_name(player_id)} : {directory.elo_by_id.get(player_id)} -> {elo}")
+
+    if args.write and corrections:
+        write_ratings(storage, corrections)
+        print("ELO corrigés enregistrés.")
+
+
+if __name__ == "__main__":
+    main()
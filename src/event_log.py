@@ -0,0 +1,137 @@
+"""
+Journal des fléchettes d'un match en cours, écrit en arrière-plan.
+
+Chaque action de la partie (joueur inscrit, lancer, multiplicateur,
+annulation) est un événement compact {match_id, seq, event, value} placé
+dans une file. Un thread d'écriture unique vide la file par lots et les
+insère dans match_events sans jamais bloquer l'interface ; un match non
+terminé peut ainsi être reconstruit en rejouant ses événements.
+"""
+import atexit
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import streamlit as st
+from streamlit.logger import get_logger
+
+from src.storage import Storage
+
+logger = get_logger(__name__)
+
+# Types d'événements (colonne event) et signification de value.
+EVENT_PLAYER = 0    # value : ID du joueur, dans l'ordre de jeu
+EVENT_THROW = 1     # value : index de la cible (GameConfig.MISS_INDEX pour un raté)
+EVENT_MULTI = 2     # value : multiplicateur du prochain lancer
+EVENT_UNDO = 3      # value : nombre de lancers annulés
+
+MAX_BATCH_SIZE = 200
+BATCH_DELAY = 0.5
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 0.5
+EXIT_FLUSH_TIMEOUT = 5.0
+
+
+class EventWriter:
+    """
+    Écrivain d'événements en arrière-plan.
+
+    record() ne fait qu'ajouter à une file non bornée ; le thread d'écriture
+    regroupe les événements arrivés pendant BATCH_DELAY en un seul insert.
+    Un lot en échec est retenté avec un délai croissant, puis abandonné
+    (avec un message dans les logs) après MAX_RETRIES tentatives.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[Storage, Dict]]" = queue.Queue()
+        self._pending: Optional[Tuple[Storage, Dict]] = None
+        self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, storage: Storage, event: Dict) -> None:
+        """
+        Ajoute un événement à écrire dans le stockage donné.
+
+        Args:
+            storage: Stockage du match (capturé côté script, le thread n'a pas de session)
+            event: Ligne {match_id, seq, event, value}
+        """
+        self._queue.put_nowait((storage, event))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attend que tous les événements enregistrés aient été traités.
+
+        Args:
+            timeout: Délai maximal en secondes (None : sans limite)
+
+        Returns:
+            True si la file a été vidée dans le délai
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _next_batch(self) -> Tuple[Storage, List[Dict]]:
+        """Attend un événement puis regroupe ceux du même stockage arrivés entre-temps."""
+        first = self._pending if self._pending is not None else self._queue.get()
+        self._pending = None
+        storage, event = first
+        batch = [event]
+
+        deadline = time.monotonic() + BATCH_DELAY
+        while len(batch) < MAX_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item[0] is not storage:
+                self._pending = item
+                break
+            batch.append(item[1])
+        return storage, batch
+
+    def _write(self, storage: Storage, batch: List[Dict]) -> None:
+        """Insère un lot, avec reprises en cas d'échec."""
+        for attempt in range(MAX_RETRIES):
+            try:
+                inserted = storage.append_match_events(batch)
+                # Lors d'une reprise, les événements déjà écrits par la tentative
+                # précédente sont ignorés normalement.
+                if attempt == 0 and inserted < len(batch):
+                    logger.warning(
+                        "%d événements du match %s ignorés : numéros déjà présents "
+                        "(partie jouée sur un autre appareil ?)",
+                        len(batch) - inserted, batch[0]["match_id"]
+                    )
+                return
+            except Exception as e:
+                logger.warning("Écriture de %d événements en échec (tentative %d) : %s", len(batch), attempt + 1, e)
+                time.sleep(RETRY_BASE_DELAY * 2 ** attempt)
+        logger.error("Abandon de %d événements du match %s", len(batch), batch[0]["match_id"])
+
+    def _run(self) -> None:
+        while True:
+            storage, batch = self._next_batch()
+            try:
+                self._write(storage, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+@st.cache_resource
+def get_event_writer() -> EventWriter:
+    """Retourne l'écrivain d'événements partagé par le processus."""
+    writer = EventWriter()
+    atexit.register(writer.flush, EXIT_FLUSH_TIMEOUT)
+    return writer
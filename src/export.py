@@ -0,0 +1,209 @@
+"""
+Export de tout l'historique des matchs terminés, pour l'analyse.
+
+Les tables matches, match_state, match_points et match_ranking sont lues
+page par page (pagination par clé) et chaque page est ajoutée aux fichiers
+de sortie : un groupe de lignes Parquet, ou un bloc de CSV compressé. Les
+noms des joueurs sont résolus en bloc avec l'annuaire. En ligne de commande,
+la mémoire utilisée ne dépend que de la taille de page, pas de celle de
+l'historique ; le téléchargement depuis la page Historique sert en revanche
+l'archive entière depuis la mémoire.
+
+Usage :
+    python -m src.export [--output-dir export] [--format parquet|csv] [--page-size 500]
+"""
+import argparse
+import csv
+import gzip
+import os
+import tempfile
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.io_pool import run_concurrently
+from src.storage import Storage, get_storage, iter_finished_match_pages
+from utils import get_player_directory
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_OUTPUT_DIR = "export"
+EXPORT_FORMATS = ("parquet", "csv")
+
+EXPORT_SCHEMAS: Dict[str, pa.Schema] = {
+    "matches": pa.schema([
+        ("id", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+    ]),
+    "match_state": pa.schema([
+        ("match_id", pa.int64()),
+        ("player_id", pa.int64()),
+        ("player_name", pa.string()),
+        ("target", pa.string()),
+        ("score", pa.int8()),
+    ]),
+    "match_points": pa.schema([
+        ("match_id", pa.int64()),
+        ("player_id", pa.int64()),
+        ("player_name", pa.string()),
+        ("points", pa.int64()),
+    ]),
+    "match_ranking": pa.schema([
+        ("match_id", pa.int64()),
+        ("player_id", pa.int64()),
+        ("player_name", pa.string()),
+        ("rank", pa.int16()),
+        ("old_elo", pa.float64()),
+        ("new_elo", pa.float64()),
+        ("delta_elo", pa.float64()),
+    ]),
+}
+
+
+class ParquetExportWriter:
+    """Écrit une table Parquet, un groupe de lignes par page."""
+
+    extension = "parquet"
+
+    def __init__(self, path: str, schema: pa.Schema):
+        self.schema = schema
+        self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+
+    def write(self, rows: List[Dict]) -> None:
+        if rows:
+            self._writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class CsvExportWriter:
+    """Écrit une table en CSV compressé (gzip), un bloc par page."""
+
+    extension = "csv.gz"
+
+    def __init__(self, path: str, schema: pa.Schema):
+        self._file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=schema.names)
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict]) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+EXPORT_WRITERS = {"parquet": ParquetExportWriter, "csv": CsvExportWriter}
+
+
+def iter_history_pages(storage: Storage, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict[str, List[Dict]]]:
+    """
+    Parcourt l'historique page par page, avec les noms des joueurs.
+
+    Chaque page coûte quatre requêtes (matches, puis les trois tables de
+    détail en parallèle) ; l'annuaire des joueurs est chargé une seule fois.
+
+    Yields:
+        Dictionnaire {table: lignes de la page}, colonnes de EXPORT_SCHEMAS
+    """
+    directory = get_player_directory()
+
+    for matches in iter_finished_match_pages(storage, page_size):
+        match_ids = [match["id"] for match in matches]
+        state_rows, points_rows, ranking_rows = run_concurrently(
+            lambda: storage.get_match_state(match_ids),
+            lambda: storage.get_match_points(match_ids),
+            lambda: storage.get_match_ranking(match_ids),
+        )
+
+        page = {"matches": [
+            {"id": match["id"], "created_at": datetime.fromisoformat(match["created_at"])} for match in matches
+        ]}
+        for table, rows in (
+            ("match_state", state_rows),
+            ("match_points", points_rows),
+            ("match_ranking", ranking_rows),
+        ):
+            columns = EXPORT_SCHEMAS[table].names
+            page[table] = [
+                {
+                    column: directory.get_name(row["player_id"]) if column == "player_name" else row[column]
+                    for column in columns
+                }
+                for row in rows
+            ]
+        yield page
+
+
+def export_history(
+        storage: Storage,
+        output_dir: str,
+        export_format: str = "parquet",
+        page_size: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, str]:
+    """
+    Exporte l'historique complet dans un fichier par table.
+
+    Args:
+        storage: Stockage à exporter
+        output_dir: Dossier de sortie (créé si besoin)
+        export_format: "parquet" ou "csv" (CSV compressé en gzip)
+        page_size: Nombre de matchs lus et écrits par page
+
+    Returns:
+        Dictionnaire {table: chemin du fichier écrit}
+    """
+    writer_class = EXPORT_WRITERS[export_format]
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {
+        table: os.path.join(output_dir, f"{table}.{writer_class.extension}") for table in EXPORT_SCHEMAS
+    }
+    writers = {table: writer_class(paths[table], schema) for table, schema in EXPORT_SCHEMAS.items()}
+    try:
+        for page in iter_history_pages(storage, page_size):
+            for table, rows in page.items():
+                writers[table].write(rows)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return paths
+
+
+def export_history_archive(export_format: str = "parquet") -> bytes:
+    """
+    Exporte l'historique dans une archive zip, pour le bouton de téléchargement.
+
+    Les fichiers sont écrits page par page sur disque puis zippés ; l'archive
+    est retournée entière en mémoire, st.download_button la lisant de toute
+    façon en entier avant de la servir.
+
+    Returns:
+        Contenu de l'archive
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        paths = export_history(get_storage(), output_dir, export_format)
+        archive_path = os.path.join(output_dir, "historique.zip")
+        with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_STORED) as zip_file:
+            for path in paths.values():
+                zip_file.write(path, os.path.basename(path))
+        with open(archive_path, "rb") as archive:
+            return archive.read()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Exporte l'historique des matchs terminés.")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args(argv)
+
+    paths = export_history(get_storage(), args.output_dir, args.format, args.page_size)
+    for table, path in paths.items():
+        print(f"{table} : {path}")
+
+
+if __name__ == "__main__":
+    main()
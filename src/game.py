@@ -1,49 +1,91 @@
+import sys
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Optional, Tuple
-from importlib import invalidate_caches
 import streamlit as st
 
+from src.assets import ICON_TEXT, get_icon_data_uris
+from src.dart_codec import decode_darts, encode_darts
+from src.elo_history import record_match_elos
+from src.event_log import EVENT_MULTI, EVENT_PLAYER, EVENT_THROW, EVENT_UNDO, EventWriter, get_event_writer
+from src.head_to_head import record_match_ranking
+from src.io_pool import run_concurrently
+from src.storage import PLAYER_STATS_COUNTERS, StaleEloError, Storage, get_storage
 from utils import (
-    get_client,
     get_player_id,
-    get_player_name,
+    get_player_directory,
+    apply_elo_updates,
     calcul_delta_elo,
     get_player_elo,
     get_player_rank,
     get_delta_elo
 )
 
+# Un match ayant reçu des fléchettes plus récemment est considéré comme en
+# cours sur un autre appareil et n'est pas proposé à la reprise.
+RESUME_IDLE_DELAY = timedelta(minutes=2)
+# Tentatives d'enregistrement d'un match dont les ELO de départ ont changé en base.
+SAVE_ATTEMPTS = 3
+# Attente maximale de l'écriture des derniers événements avant l'enregistrement,
+# qui supprime le journal du match.
+SAVE_FLUSH_TIMEOUT = 5.0
+
 
 class GameConfig:
     """Configuration centralisée du jeu"""
-    URL_SIMPLE = "https://jjdotprdoyufgsvcgnky.supabase.co/storage/v1/object/public/cricket%20icons/simple.png"
-    URL_DOUBLE = "https://jjdotprdoyufgsvcgnky.supabase.co/storage/v1/object/public/cricket%20icons/double.png"
-    URL_TRIPLE = "https://jjdotprdoyufgsvcgnky.supabase.co/storage/v1/object/public/cricket%20icons/triple.png"
-    URL_BLANK = "https://jjdotprdoyufgsvcgnky.supabase.co/storage/v1/object/public/cricket%20icons/blank.png"
-
     DARTS_PER_ROUND = 3
     NUM_ROUNDS = 20
     TARGETS = ["20", "19", "18", "17", "16", "15", "25"]
     TARGETS_DISPLAY = ["20", "19", "18", "17", "16", "15", "B"]
     MAX_SCORE_PER_TARGET = 3
 
+    TARGET_INDEX = {target: i for i, target in enumerate(TARGETS)}
+    TARGET_VALUES = np.array([int(target) for target in TARGETS], dtype=np.int64)
+    MISS_INDEX = -1
+
+    # Une entrée du journal d'annulation par fléchette :
+    # (index cible, multiplicateur, score précédent, points ajoutés, masque des joueurs crédités)
+    JOURNAL_STRIDE = 5
+
 
-def get_icon(score: int) -> str:
+@dataclass
+class PlayerResult:
+    """Résultat d'un joueur à l'issue d'un match enregistré."""
+    player_id: int
+    rank: int
+    points: int
+    old_elo: float
+    new_elo: float
+    delta_elo: float
+
+
+@dataclass
+class MatchSummary:
+    """Résumé d'un match enregistré, suffisant pour l'écran de résultat."""
+    match_id: int
+    ranking: Dict[str, List[str]]
+    players: Dict[str, PlayerResult]
+
+
+def get_icon(score: int, text_icons: bool = False) -> str:
     """
-    Retourne l'URL de l'icône correspondant au score.
+    Retourne l'icône correspondant au score.
     
     Args:
         score: Score du joueur sur une cible (0-3)
+        text_icons: Si True, retourne un symbole texte au lieu d'une image
         
     Returns:
-        URL de l'icône correspondante
+        Data URI de l'icône embarquée, ou symbole texte
     """
-    icon_map = {
-        3: GameConfig.URL_TRIPLE,
-        2: GameConfig.URL_DOUBLE,
-        1: GameConfig.URL_SIMPLE
-    }
-    return icon_map.get(score, GameConfig.URL_BLANK)
+    if text_icons:
+        return ICON_TEXT.get(score, "")
+    icons = get_icon_data_uris()
+    return icons.get(score, icons[0])
 
 
 def create_match_in_db() -> Optional[int]:
@@ -56,50 +98,128 @@ def create_match_in_db() -> Optional[int]:
     Raises:
         Exception: En cas d'erreur lors de la création
     """
-    client = get_client()
     try:
-        response = client.table("matches").insert(
-            [{"is_finished": False}], count="None"
-        ).execute()
-        return response.data[0]['id']
+        return get_storage().create_match()
     except Exception as e:
         st.error(f"Erreur lors de la création du match : {e}")
         raise
 
 
-def get_state_from_db(match_id: int) -> Tuple[pd.DataFrame, List[str]]:
+def state_from_rows(state_rows: List[Dict]) -> Tuple[np.ndarray, List[str]]:
     """
-    Récupère l'état d'un match depuis la base de données.
+    Construit l'état d'un match à partir de ses lignes match_state.
     
     Args:
-        match_id: ID du match à récupérer
+        state_rows: Lignes {player_id, target, score} d'un même match
         
     Returns:
-        Tuple contenant (état du jeu, liste des joueurs)
+        Tuple contenant (état du jeu cibles × joueurs, liste des joueurs)
     """
-    client = get_client()
-    response_match_state = (
-        client.table("match_state")
-        .select("player_id", "target", "score")
-        .eq("match_id", match_id)
-        .execute()
-    )
+    directory = get_player_directory()
+    player_ids = list({int(item["player_id"]) for item in state_rows})
+    player_list = [directory.get_name(player_id) for player_id in player_ids]
+    player_index = {player_id: i for i, player_id in enumerate(player_ids)}
 
-    player_ids = list({item["player_id"] for item in response_match_state.data})
-    player_list = [get_player_name(int(player_id)) for player_id in player_ids]
-
-    state = pd.DataFrame(
-        [{name: 0 for name in player_list} for _ in range(len(GameConfig.TARGETS))],
-        index=GameConfig.TARGETS
-    )
+    state = np.zeros((len(GameConfig.TARGETS), len(player_list)), dtype=np.int8)
 
-    for data in response_match_state.data:
-        state.loc[data["target"], get_player_name(int(data["player_id"]))] = data["score"]
+    for data in state_rows:
+        state[GameConfig.TARGET_INDEX[data["target"]], player_index[int(data["player_id"])]] = data["score"]
 
     return state, player_list
 
 
-def get_points_from_db(match_id: int, player_list: List[str]) -> pd.DataFrame:
+def points_from_rows(points_rows: List[Dict], player_list: List[str]) -> np.ndarray:
+    """
+    Construit le vecteur des points d'un match à partir de ses lignes match_points.
+    
+    Args:
+        points_rows: Lignes {player_id, points} d'un même match
+        player_list: Liste des noms de joueurs
+        
+    Returns:
+        Vecteur des points des joueurs, dans l'ordre de player_list
+    """
+    directory = get_player_directory()
+    player_index = {name: i for i, name in enumerate(player_list)}
+    player_points = np.zeros(len(player_list), dtype=np.int64)
+
+    for data in points_rows:
+        player_points[player_index[directory.get_name(data["player_id"])]] = data["points"]
+
+    return player_points
+
+
+def player_stats_from_rows(
+        state_rows: List[Dict],
+        points_rows: List[Dict],
+        ranking_rows: List[Dict]
+) -> Dict[int, Dict]:
+    """
+    Calcule les statistiques agrégées (table player_stats) d'un ensemble de matchs terminés.
+    
+    Les compteurs sont additifs et elo_peak est un maximum : les statistiques
+    de lots de matchs distincts se combinent avec merge_player_stats.
+    
+    Args:
+        state_rows: Lignes match_state des matchs
+        points_rows: Lignes match_points des matchs
+        ranking_rows: Lignes match_ranking des matchs (une par joueur et par match)
+        
+    Returns:
+        Dictionnaire {player_id: ligne player_stats}
+    """
+    stats: Dict[int, Dict] = {}
+
+    def player_stats(player_id) -> Dict:
+        player_id = int(player_id)
+        if player_id not in stats:
+            stats[player_id] = {"player_id": player_id, **dict.fromkeys(PLAYER_STATS_COUNTERS, 0), "elo_peak": None}
+        return stats[player_id]
+
+    for row in ranking_rows:
+        entry = player_stats(row["player_id"])
+        entry["games"] += 1
+        entry["wins"] += int(row["rank"]) == 1
+        new_elo = float(row["new_elo"])
+        entry["elo_peak"] = new_elo if entry["elo_peak"] is None else max(entry["elo_peak"], new_elo)
+
+    for row in points_rows:
+        player_stats(row["player_id"])["points_conceded"] += int(row["points"])
+
+    for row in state_rows:
+        if int(row["score"]) >= GameConfig.MAX_SCORE_PER_TARGET:
+            player_stats(row["player_id"])[f"closed_{row['target']}"] += 1
+
+    return stats
+
+
+def merge_player_stats(total: Dict[int, Dict], stats: Dict[int, Dict]) -> None:
+    """Ajoute sur place les statistiques d'un lot de matchs à un total."""
+    for player_id, entry in stats.items():
+        if player_id not in total:
+            total[player_id] = dict(entry)
+            continue
+        merged = total[player_id]
+        for column in PLAYER_STATS_COUNTERS:
+            merged[column] += entry[column]
+        peaks = [elo for elo in (merged["elo_peak"], entry["elo_peak"]) if elo is not None]
+        merged["elo_peak"] = max(peaks) if peaks else None
+
+
+def get_state_from_db(match_id: int) -> Tuple[np.ndarray, List[str]]:
+    """
+    Récupère l'état d'un match depuis la base de données.
+    
+    Args:
+        match_id: ID du match à récupérer
+        
+    Returns:
+        Tuple contenant (état du jeu cibles × joueurs, liste des joueurs)
+    """
+    return state_from_rows(get_storage().get_match_state([match_id]))
+
+
+def get_points_from_db(match_id: int, player_list: List[str]) -> np.ndarray:
     """
     Récupère les points des joueurs depuis la base de données.
     
@@ -108,90 +228,308 @@ def get_points_from_db(match_id: int, player_list: List[str]) -> pd.DataFrame:
         player_list: Liste des noms de joueurs
         
     Returns:
-        DataFrame contenant les points des joueurs
+        Vecteur des points des joueurs, dans l'ordre de player_list
     """
-    client = get_client()
-    response_player_points = (
-        client.table("match_points")
-        .select("player_id", "points")
-        .eq("match_id", match_id)
-        .execute()
-    )
+    return points_from_rows(get_storage().get_match_points([match_id]), player_list)
 
-    player_points = pd.DataFrame(
-        [{name: 0 for name in player_list}],
-        index=["points"]
+
+def load_finished_games(match_ids: List[int]) -> Dict[int, "CricketGame"]:
+    """
+    Charge en bloc plusieurs matchs terminés pour l'affichage.
+    
+    Une seule requête in_() est faite par table (match_state, match_points,
+    match_ranking) pour toute la page, les trois en parallèle, puis les
+    parties sont construites en mémoire.
+    
+    Args:
+        match_ids: IDs des matchs à charger
+        
+    Returns:
+        Dictionnaire {match_id: CricketGame}, dans l'ordre de match_ids
+    """
+    if not match_ids:
+        return {}
+
+    storage = get_storage()
+    tables = ("match_state", "match_points", "match_ranking")
+    results = run_concurrently(
+        lambda: storage.get_match_state(match_ids),
+        lambda: storage.get_match_points(match_ids),
+        lambda: storage.get_match_ranking(match_ids),
     )
 
-    for data in response_player_points.data:
-        player_points.loc["points", get_player_name(int(data["player_id"]))] = data["points"]
+    rows_by_table = {}
+    for table, rows in zip(tables, results):
+        grouped: Dict[int, List[Dict]] = {match_id: [] for match_id in match_ids}
+        for row in rows:
+            grouped[int(row["match_id"])].append(row)
+        rows_by_table[table] = grouped
+
+    return {
+        match_id: CricketGame.from_rows(
+            match_id,
+            rows_by_table["match_state"][match_id],
+            rows_by_table["match_points"][match_id],
+            rows_by_table["match_ranking"][match_id],
+        )
+        for match_id in match_ids
+    }
 
-    return player_points
+
+def load_unfinished_games(limit: int) -> Dict[int, "CricketGame"]:
+    """
+    Reconstruit les derniers matchs non terminés à partir de leur journal de fléchettes.
+    
+    Les matchs sans événement (créés avant le journal) ne peuvent pas être
+    repris et sont ignorés, de même que ceux dont la dernière fléchette date
+    de moins de RESUME_IDLE_DELAY : les reprendre ferait écrire deux appareils
+    dans le même journal.
+    
+    Args:
+        limit: Nombre maximal de matchs non terminés examinés
+        
+    Returns:
+        Dictionnaire {match_id: CricketGame}, plus récents d'abord
+    """
+    storage = get_storage()
+    matches = storage.list_unfinished_matches(limit)
+    events_by_match: Dict[int, List[Dict]] = {match["id"]: [] for match in matches}
+    for row in storage.get_match_events(list(events_by_match)):
+        events_by_match[int(row["match_id"])].append(row)
+
+    idle_since = datetime.now(timezone.utc) - RESUME_IDLE_DELAY
+    return {
+        match_id: CricketGame.from_events(match_id, events)
+        for match_id, events in events_by_match.items()
+        if events and not is_recently_played(events, idle_since)
+    }
+
+
+def is_recently_played(events: List[Dict], idle_since: datetime) -> bool:
+    """Indique si un match a reçu un événement après idle_since (dates absentes ignorées)."""
+    return any(
+        datetime.fromisoformat(row["created_at"]) > idle_since
+        for row in events if row.get("created_at")
+    )
 
 
 class CricketGame:
     """
     Classe représentant une partie de Cricket (jeu de fléchettes).
     
+    L'état est stocké sous forme de tableaux NumPy indexés par entiers
+    (cibles × joueurs pour les marques, un vecteur pour les points) ;
+    les DataFrames ne sont construits qu'à la demande pour l'affichage.
+    
     Attributes:
         id_match: ID unique du match
         player_list: Liste des noms des joueurs
-        actual_state: État actuel du jeu (scores par cible)
-        player_points: Points actuels des joueurs
+        state: Marques par cible et par joueur (cibles × joueurs)
+        points: Points actuels des joueurs
         match_ended: Indicateur de fin de match
     """
 
-    def __init__(self, player_list: Optional[List[str]] = None, match_id: Optional[int] = None):
+    def __init__(
+            self,
+            player_list: Optional[List[str]] = None,
+            match_id: Optional[int] = None,
+            record_events: bool = True
+    ):
         """
         Initialise une nouvelle partie ou charge une partie existante.
         
         Args:
             player_list: Liste des joueurs pour une nouvelle partie
             match_id: ID d'un match existant à charger
+            record_events: Si False, la nouvelle partie n'alimente pas le journal des fléchettes
         """
         if player_list:
-            self._init_new_game(player_list)
+            self._init_new_game(player_list, record_events)
         elif match_id:
             self._load_existing_game(match_id)
         else:
             raise ValueError("Vous devez fournir soit player_list, soit match_id")
 
-    def _init_new_game(self, player_list: List[str]) -> None:
-        """Initialise une nouvelle partie."""
+    def _init_new_game(self, player_list: List[str], record_events: bool = True) -> None:
+        """Initialise une nouvelle partie et inscrit ses joueurs dans le journal."""
         self.id_match = create_match_in_db()
-        self.player_list = player_list
+        self._init_play_state(player_list)
+        if record_events:
+            self._start_recording()
+
+        directory = get_player_directory()
+        for player in self.player_list:
+            self._record_event(EVENT_PLAYER, directory.get_id(player))
+
+    def _init_play_state(self, player_list: List[str]) -> None:
+        """Initialise l'état d'une partie au premier lancer."""
+        self._set_players(player_list)
         self.multi = 1
         self.total_dart_number = (
                 len(player_list) * GameConfig.DARTS_PER_ROUND * GameConfig.NUM_ROUNDS
         )
         self.actual_dart = 1
 
-        self.actual_state = pd.DataFrame(
-            [{name: 0 for name in player_list} for _ in range(len(GameConfig.TARGETS))],
-            index=GameConfig.TARGETS
-        )
-
-        self.player_points = pd.DataFrame(
-            [{name: 0 for name in player_list}],
-            index=["points"]
-        )
+        self.state = np.zeros((len(GameConfig.TARGETS), len(player_list)), dtype=np.int8)
+        self.points = np.zeros(len(player_list), dtype=np.int64)
+        self._init_end_trackers()
 
-        self.state_history: Dict[str, pd.DataFrame] = {}
-        self.points_history: Dict[str, pd.DataFrame] = {}
+        self.journal = array("h")
+        self.delta_elo: Optional[Dict[str, float]] = None
+        self.summary: Optional[MatchSummary] = None
+        self._event_seq = 0
+        self._event_sink: Optional[Tuple[EventWriter, Storage]] = None
 
         self.match_ended = False
 
+    @classmethod
+    def from_events(cls, match_id: int, events: List[Dict]) -> "CricketGame":
+        """
+        Reconstruit une partie en cours en rejouant son journal de fléchettes.
+        
+        La partie reconstruite continue d'alimenter le journal à la suite.
+        
+        Args:
+            match_id: ID du match
+            events: Événements {seq, event, value} du match, triés par seq
+        """
+        directory = get_player_directory()
+        game = cls.__new__(cls)
+        game.id_match = match_id
+        game._init_play_state(
+            [directory.get_name(row["value"]) for row in events if row["event"] == EVENT_PLAYER]
+        )
+
+        for row in events:
+            if row["event"] == EVENT_THROW:
+                target_idx = row["value"]
+                game.throw("0" if target_idx == GameConfig.MISS_INDEX else GameConfig.TARGETS[target_idx])
+            elif row["event"] == EVENT_MULTI:
+                game.set_multi(row["value"])
+            elif row["event"] == EVENT_UNDO:
+                game.rewind(row["value"])
+
+        game._event_seq = max(row["seq"] for row in events) + 1
+        game._start_recording()
+        return game
+
+    @classmethod
+    def from_darts(cls, match_id: int, blob: bytes, num_darts: Optional[int] = None) -> "CricketGame":
+        """
+        Reconstruit une partie à partir de ses fléchettes encodées (matches.darts).
+        
+        Args:
+            match_id: ID du match
+            blob: Fléchettes encodées (voir src/dart_codec.py)
+            num_darts: Nombre de fléchettes à rejouer, pour un état intermédiaire ;
+                par défaut toutes (état final)
+        """
+        directory = get_player_directory()
+        player_ids, target_indices, multipliers = decode_darts(blob)
+        game = cls.__new__(cls)
+        game.id_match = match_id
+        game._init_play_state([directory.get_name(player_id) for player_id in player_ids])
+
+        for target_idx, multiplier in zip(target_indices[:num_darts].tolist(), multipliers[:num_darts].tolist()):
+            game.multi = multiplier
+            game.throw("0" if target_idx == GameConfig.MISS_INDEX else GameConfig.TARGETS[target_idx])
+        return game
+
+    @classmethod
+    def from_rows(
+            cls,
+            match_id: int,
+            state_rows: List[Dict],
+            points_rows: List[Dict],
+            ranking_rows: Optional[List[Dict]] = None
+    ) -> "CricketGame":
+        """
+        Construit une partie terminée à partir de lignes déjà chargées, sans requête.
+        
+        Args:
+            match_id: ID du match
+            state_rows: Lignes match_state du match
+            points_rows: Lignes match_points du match
+            ranking_rows: Lignes match_ranking du match (deltas ELO), optionnel
+        """
+        game = cls.__new__(cls)
+        game.id_match = match_id
+        game.state, player_list = state_from_rows(state_rows)
+        game._set_players(player_list)
+        game.points = points_from_rows(points_rows, game.player_list)
+        game._set_finished()
+        if ranking_rows is not None:
+            directory = get_player_directory()
+            game.delta_elo = {
+                directory.get_name(row["player_id"]): row["delta_elo"] for row in ranking_rows
+            }
+        return game
+
     def _load_existing_game(self, match_id: int) -> None:
         """Charge une partie existante depuis la base de données."""
         self.id_match = match_id
-        self.actual_state, self.player_list = get_state_from_db(match_id)
-        self.player_points = get_points_from_db(match_id, self.player_list)
+        self.state, player_list = get_state_from_db(match_id)
+        self._set_players(player_list)
+        self.points = get_points_from_db(match_id, self.player_list)
+        self._set_finished()
+
+    def _set_finished(self) -> None:
+        """Initialise les attributs d'une partie chargée (terminée)."""
+        self._init_end_trackers()
+        self.journal = array("h")
+        self.delta_elo: Optional[Dict[str, float]] = None
+        self.summary: Optional[MatchSummary] = None
+        self._event_sink = None
         self.match_ended = True
 
+    def _set_players(self, player_list: List[str]) -> None:
+        """Enregistre la liste des joueurs et leur index dans les tableaux."""
+        self.player_list = list(player_list)
+        self.player_index = {name: i for i, name in enumerate(self.player_list)}
+        self._player_bits = np.left_shift(1, np.arange(len(self.player_list), dtype=np.int64))
+
+    def _start_recording(self) -> None:
+        """Active le journal des fléchettes (écrivain et stockage résolus une fois pour toutes)."""
+        self._event_sink = (get_event_writer(), get_storage())
+
+    def _record_event(self, event: int, value: int) -> None:
+        """Envoie un événement au journal du match, sans attendre son écriture."""
+        if self._event_sink is None:
+            return
+        writer, storage = self._event_sink
+        writer.record(storage, {"match_id": self.id_match, "seq": self._event_seq, "event": event, "value": value})
+        self._event_seq += 1
+
+    def _init_end_trackers(self) -> None:
+        """
+        Initialise les compteurs utilisés pour détecter la fin du match :
+        nombre de cibles fermées par joueur et joueur seul en tête (moins de points).
+        """
+        self.closed_count = (self.state == GameConfig.MAX_SCORE_PER_TARGET).sum(axis=0).tolist()
+        self._update_leader()
+
+    def _update_leader(self) -> None:
+        """Recalcule le joueur ayant strictement le moins de points (-1 en cas d'égalité)."""
+        at_lowest = np.flatnonzero(self.points == self.points.min())
+        self.leader = int(at_lowest[0]) if at_lowest.size == 1 else -1
+
+    @property
+    def actual_state(self) -> pd.DataFrame:
+        """État du jeu sous forme de DataFrame (cibles × joueurs), pour l'affichage."""
+        return pd.DataFrame(self.state.astype(np.int64), index=GameConfig.TARGETS, columns=self.player_list)
+
+    @property
+    def player_points(self) -> pd.DataFrame:
+        """Points des joueurs sous forme de DataFrame, pour l'affichage."""
+        return pd.DataFrame([self.points], index=["points"], columns=self.player_list)
+
+    def _get_actual_player_index(self) -> int:
+        """Retourne l'index du joueur actuel."""
+        return ((self.actual_dart - 1) // GameConfig.DARTS_PER_ROUND) % len(self.player_list)
+
     def get_actual_player(self) -> str:
         """Retourne le nom du joueur actuel."""
-        player_index = ((self.actual_dart - 1) // GameConfig.DARTS_PER_ROUND) % len(self.player_list)
-        return self.player_list[player_index]
+        return self.player_list[self._get_actual_player_index()]
 
     def get_tour_number(self) -> int:
         """Retourne le numéro du tour actuel."""
@@ -207,11 +545,11 @@ class CricketGame:
 
     def get_cell(self, player: str, target: str) -> int:
         """Retourne le score d'un joueur sur une cible."""
-        return int(self.actual_state.loc[target, player])
+        return int(self.state[GameConfig.TARGET_INDEX[target], self.player_index[player]])
 
     def get_points(self, player: str) -> int:
         """Retourne les points d'un joueur."""
-        return int(self.player_points.loc["points", player])
+        return int(self.points[self.player_index[player]])
 
     def get_ranking(self) -> Dict[str, List[str]]:
         """
@@ -221,13 +559,15 @@ class CricketGame:
             Dictionnaire {rang : [liste de joueurs]}
             Exemple : {"1" : ["Alice"], "2" : ["Bob", "Tom"]}
         """
-        sorted_players = self.player_points.loc["points"].sort_values()
+        order = np.argsort(self.points, kind="stable")
 
         ranking = {}
         current_rank = 1
         previous_score = None
 
-        for player, score in sorted_players.items():
+        for player_idx in order:
+            player = self.player_list[player_idx]
+            score = int(self.points[player_idx])
             if score != previous_score:
                 ranking[str(current_rank)] = [player]
                 previous_score = score
@@ -237,6 +577,18 @@ class CricketGame:
 
         return ranking
 
+    def get_delta_elo(self, player: str) -> Optional[float]:
+        """Retourne la variation d'ELO d'un joueur pour ce match."""
+        if self.delta_elo is not None:
+            return self.delta_elo.get(player)
+        return get_delta_elo(self.id_match, player)
+
+    def _get_current_elo(self, player: str) -> Optional[float]:
+        """Retourne l'ELO d'un joueur, issu du résumé de sauvegarde s'il existe."""
+        if self.summary is not None:
+            return self.summary.players[player].new_elo
+        return get_player_elo(player)
+
     def get_ranking_to_print(self, for_history: bool = False) -> str:
         """
         Génère une représentation HTML du classement avec les deltas ELO.
@@ -257,11 +609,11 @@ class CricketGame:
             players_formatted = []
 
             for player in players:
-                delta = get_delta_elo(self.id_match, player)
+                delta = self.get_delta_elo(player)
                 sign_delta = f"{delta:+}"
                 color = "green" if delta >= 0 else "red"
 
-                elo_display = "" if for_history else f"{get_player_elo(player)} "
+                elo_display = "" if for_history else f"{self._get_current_elo(player)} "
                 player_str = f"{player} {elo_display}<span style='color:{color}'>({sign_delta})</span>"
                 players_formatted.append(player_str)
 
@@ -269,28 +621,40 @@ class CricketGame:
 
         return "  \n".join(result_lines)
 
-    def get_df_to_print(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    def get_df_to_print(self, text_icons: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Retourne les DataFrames formatés pour l'affichage Streamlit.
         
+        Args:
+            text_icons: Si True, les marques sont des symboles texte au lieu d'images
+        
         Returns:
             Tuple (DataFrame avec icônes, DataFrame des points)
         """
+        icons = np.array(
+            [get_icon(score, text_icons) for score in range(GameConfig.MAX_SCORE_PER_TARGET + 1)],
+            dtype=object
+        )
         df_with_icons = pd.DataFrame(
-            {
-                player: [get_icon(self.get_cell(player, target)) for target in GameConfig.TARGETS]
-                for player in self.player_list
-            },
+            icons[self.state],
             index=GameConfig.TARGETS_DISPLAY,
+            columns=self.player_list,
             dtype=object
         )
 
         return df_with_icons, self.player_points
 
+    def get_column_config(self, text_icons: bool = False) -> Dict:
+        """Retourne la configuration des colonnes du tableau de score pour st.dataframe."""
+        if text_icons:
+            return {player: st.column_config.TextColumn(player) for player in self.player_list}
+        return {player: st.column_config.ImageColumn(player) for player in self.player_list}
+
     def set_multi(self, multiplier: int) -> None:
         """Définit le multiplicateur pour le prochain lancer."""
         if multiplier in [1, 2, 3]:
             self.multi = multiplier
+            self._record_event(EVENT_MULTI, multiplier)
         else:
             raise ValueError("Le multiplicateur doit être 1, 2 ou 3")
 
@@ -304,23 +668,16 @@ class CricketGame:
         Returns:
             True si le joueur a gagné, False sinon
         """
-        if self.actual_state.loc[:, player].tolist() != [GameConfig.MAX_SCORE_PER_TARGET] * len(GameConfig.TARGETS):
-            return False
-
-        player_score = self.get_points(player)
-        for other_player in self.player_list:
-            if other_player != player:
-                if self.get_points(other_player) <= player_score:
-                    return False
-
-        return True
+        player_idx = self.player_index[player]
+        return player_idx == self.leader and self.closed_count[player_idx] == len(GameConfig.TARGETS)
 
     def check_end_match(self) -> bool:
         """Vérifie si le match est terminé."""
         if self.actual_dart > self.total_dart_number:
             return True
 
-        return any(self.is_player_winning(player) for player in self.player_list)
+        # Seul le joueur strictement en tête peut avoir gagné.
+        return self.leader >= 0 and self.closed_count[self.leader] == len(GameConfig.TARGETS)
 
     def throw(self, target: str) -> None:
         """
@@ -332,57 +689,138 @@ class CricketGame:
         if self.match_ended:
             return
 
-        self.state_history[str(self.actual_dart)] = self.actual_state.copy()
-        self.points_history[str(self.actual_dart)] = self.player_points.copy()
-
-        actual_player = self.get_actual_player()
+        target_idx = GameConfig.MISS_INDEX
+        previous_score = 0
+        added_points = 0
+        credited_mask = 0
 
         if target != "0":
-            current_score = self.get_cell(actual_player, target)
-            new_score = current_score + self.multi
+            player_idx = self._get_actual_player_index()
+            target_idx = GameConfig.TARGET_INDEX[target]
+            previous_score = int(self.state[target_idx, player_idx])
+            new_score = previous_score + self.multi
 
             if new_score > GameConfig.MAX_SCORE_PER_TARGET:
                 overflow = new_score - GameConfig.MAX_SCORE_PER_TARGET
-                added_points = overflow * int(target)
+                open_players = self.state[target_idx] < GameConfig.MAX_SCORE_PER_TARGET
+                open_players[player_idx] = False
+                added_points = overflow * int(GameConfig.TARGET_VALUES[target_idx])
+                self.points[open_players] += added_points
+                credited_mask = int(self._player_bits[open_players].sum())
+
+                # Les points ne font que monter : la tête ne change que si le meneur
+                # en reçoit ou s'il n'y avait pas de meneur unique.
+                if added_points and (self.leader < 0 or open_players[self.leader]):
+                    self._update_leader()
 
-                for other_player in self.player_list:
-                    if other_player != actual_player and self.get_cell(other_player,
-                                                                       target) < GameConfig.MAX_SCORE_PER_TARGET:
-                        self.player_points.loc["points", other_player] += added_points
+            self.state[target_idx, player_idx] = min(new_score, GameConfig.MAX_SCORE_PER_TARGET)
+            if previous_score < GameConfig.MAX_SCORE_PER_TARGET <= new_score:
+                self.closed_count[player_idx] += 1
 
-            self.actual_state.loc[target, actual_player] = min(new_score, GameConfig.MAX_SCORE_PER_TARGET)
+        self.journal.extend((target_idx, self.multi, previous_score, added_points, credited_mask))
+        self._record_event(EVENT_THROW, target_idx)
 
         self.multi = 1
         self.actual_dart += 1
         self.match_ended = self.check_end_match()
 
+    def get_num_journal_entries(self) -> int:
+        """Retourne le nombre de fléchettes annulables enregistrées dans le journal."""
+        return len(self.journal) // GameConfig.JOURNAL_STRIDE
+
+    def _undo_last_dart(self) -> None:
+        """Rejoue à l'envers la dernière entrée du journal."""
+        stride = GameConfig.JOURNAL_STRIDE
+        target_idx, _, previous_score, added_points, credited_mask = self.journal[-stride:]
+        del self.journal[-stride:]
+        self.actual_dart -= 1
+
+        if target_idx != GameConfig.MISS_INDEX:
+            player_idx = self._get_actual_player_index()
+            if (self.state[target_idx, player_idx] == GameConfig.MAX_SCORE_PER_TARGET
+                    and previous_score < GameConfig.MAX_SCORE_PER_TARGET):
+                self.closed_count[player_idx] -= 1
+            self.state[target_idx, player_idx] = previous_score
+
+            if added_points:
+                self.points[(credited_mask & self._player_bits) != 0] -= added_points
+                self._update_leader()
+
+    def rewind(self, num_darts: int) -> None:
+        """
+        Annule plusieurs lancers en rejouant le journal à l'envers.
+        
+        Args:
+            num_darts: Nombre de lancers à annuler (borné à la taille du journal)
+        """
+        num_darts = min(num_darts, self.get_num_journal_entries())
+        if num_darts <= 0:
+            return
+
+        for _ in range(num_darts):
+            self._undo_last_dart()
+        self.match_ended = False
+        self._record_event(EVENT_UNDO, num_darts)
+
     def return_to_last_state(self) -> None:
         """Annule le dernier lancer."""
-        prev_dart_key = str(self.actual_dart - 1)
+        self.rewind(1)
+
+    def encode_darts(self) -> bytes:
+        """Encode les fléchettes jouées (hors fléchettes annulées), voir src/dart_codec.py."""
+        stride = GameConfig.JOURNAL_STRIDE
+        directory = get_player_directory()
+        return encode_darts(
+            [directory.get_id(player) for player in self.player_list],
+            np.array(self.journal[0::stride], dtype=np.int16),
+            np.array(self.journal[1::stride], dtype=np.int16),
+        )
 
-        if prev_dart_key in self.state_history:
-            self.actual_state = self.state_history[prev_dart_key]
-            self.player_points = self.points_history[prev_dart_key]
-            self.actual_dart -= 1
-            self.match_ended = False
+    def compact(self) -> None:
+        """
+        Libère ce qui ne sert plus une fois la partie enregistrée : le journal
+        d'annulation est vidé et le journal des fléchettes n'est plus alimenté.
+        """
+        self.journal = array("h")
+        self._event_sink = None
 
-    def state_to_base(self) -> None:
+    def memory_size(self) -> int:
         """
-        Sauvegarde l'état complet du match dans la base de données.
-        Optimisé avec des insertions groupées (batch inserts).
-        
-        Raises:
-            Exception: En cas d'erreur lors de la sauvegarde
+        Estime la mémoire propre à la partie, en octets : tableaux NumPy,
+        journal d'annulation, noms et dictionnaires des joueurs. Les objets
+        partagés par le processus (stockage, écrivain d'événements) sont exclus.
         """
-        client = get_client()
+        size = sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+        size += self.state.nbytes + self.points.nbytes + self._player_bits.nbytes
+        size += sys.getsizeof(self.journal)
+        size += sys.getsizeof(self.player_list) + sys.getsizeof(self.player_index)
+        size += sum(sys.getsizeof(player) for player in self.player_list)
+        size += sys.getsizeof(self.closed_count)
+        if self.delta_elo is not None:
+            size += sys.getsizeof(self.delta_elo)
+        if self.summary is not None:
+            size += sys.getsizeof(self.summary.players) + sys.getsizeof(self.summary.ranking)
+            size += sum(sys.getsizeof(result) for result in self.summary.players.values())
+        return size
+
+    def _save_rows(
+            self,
+            players_ranking: Dict[str, List[str]],
+            old_elos: Dict[str, float]
+    ) -> Tuple[List[Dict], List[Dict], List[Dict], Dict[str, PlayerResult]]:
+        """
+        Calcule les lignes à enregistrer pour des ELO de départ donnés.
 
+        Returns:
+            Tuple (lignes match_points, lignes match_state, lignes match_ranking,
+            résultat de chaque joueur)
+        """
         match_points_data = []
         match_state_data = []
         match_ranking_data = []
-        player_updates = []
+        results = {}
 
-        players_ranking = self.get_ranking()
-        deltas_elo = calcul_delta_elo(players_ranking, self.player_list)
+        deltas_elo = calcul_delta_elo(players_ranking, self.player_list, old_elos)
 
         for player in self.player_list:
             player_id = get_player_id(player)
@@ -401,40 +839,79 @@ class CricketGame:
                     "score": int(self.get_cell(player, target))
                 })
 
-            old_elo = get_player_elo(player)
+            old_elo = old_elos[player]
             delta_elo = deltas_elo[player]
             new_elo = old_elo + delta_elo
+            rank = get_player_rank(players_ranking, player)
 
             match_ranking_data.append({
                 "match_id": self.id_match,
                 "player_id": player_id,
-                "rank": get_player_rank(players_ranking, player),
+                "rank": rank,
                 "old_elo": old_elo,
                 "new_elo": new_elo,
                 "delta_elo": delta_elo
             })
 
-            player_updates.append({"id": player_id, "elo": new_elo})
-
-        try:
-            if match_points_data:
-                client.table("match_points").insert(match_points_data, count="None").execute()
+            results[player] = PlayerResult(
+                player_id=player_id,
+                rank=rank,
+                points=int(self.get_points(player)),
+                old_elo=old_elo,
+                new_elo=new_elo,
+                delta_elo=delta_elo
+            )
 
-            if match_state_data:
-                client.table("match_state").insert(match_state_data, count="None").execute()
+        return match_points_data, match_state_data, match_ranking_data, results
 
-            if match_ranking_data:
-                client.table("match_ranking").insert(match_ranking_data, count="None").execute()
-
-            client.table("matches").update({"is_finished": True}).eq("id", self.id_match).execute()
-
-            for update in player_updates:
-                client.table("players").update({"player_elo": update["elo"]}).eq("id", update["id"]).execute()
-
-            invalidate_caches()
-
-            st.success("Match sauvegardé avec succès!")
+    def state_to_base(self) -> MatchSummary:
+        """
+        Sauvegarde l'état complet du match dans la base de données.
+        
+        Points, état, classement, fin du match, fléchettes encodées, nouveaux ELO et
+        statistiques des joueurs sont envoyés en un seul appel au stockage, qui les enregistre dans une transaction
+        unique (fonction Postgres save_match pour Supabase, voir sql/save_match.sql).
+        Les nouveaux ELO et le classement sont ensuite ajoutés à l'historique ELO et
+        aux confrontations directes en cache.
+        
+        Les ELO de départ viennent de l'annuaire en cache ; si le stockage les
+        trouve modifiés en base, l'annuaire est rechargé et le match recalculé.
+        
+        Returns:
+            Résumé du résultat, utilisé pour l'affichage sans nouvelle requête
+        
+        Raises:
+            Exception: En cas d'erreur lors de la sauvegarde, affichée par l'appelant
+        """
+        if self._event_sink is not None:
+            # Un événement écrit après l'enregistrement resterait dans le journal.
+            self._event_sink[0].flush(SAVE_FLUSH_TIMEOUT)
 
-        except Exception as e:
-            st.error(f"Erreur lors de la sauvegarde du match : {e}")
-            raise
+        players_ranking = self.get_ranking()
+        for attempt in range(SAVE_ATTEMPTS):
+            old_elos = {player: get_player_elo(player) for player in self.player_list}
+            match_points_data, match_state_data, match_ranking_data, results = self._save_rows(
+                players_ranking, old_elos
+            )
+            stats_data = list(
+                player_stats_from_rows(match_state_data, match_points_data, match_ranking_data).values()
+            )
+            try:
+                created_at = get_storage().save_match(
+                    self.id_match, match_points_data, match_state_data, match_ranking_data, stats_data,
+                    self.encode_darts()
+                )
+                break
+            except StaleEloError:
+                if attempt == SAVE_ATTEMPTS - 1:
+                    raise
+                get_player_directory().refresh()
+
+        new_elos = {result.player_id: result.new_elo for result in results.values()}
+        apply_elo_updates(new_elos, self.id_match)
+        record_match_elos(new_elos, datetime.fromisoformat(created_at))
+        record_match_ranking(match_ranking_data)
+
+        self.summary = MatchSummary(match_id=self.id_match, ranking=players_ranking, players=results)
+        self.delta_elo = {player: result.delta_elo for player, result in results.items()}
+        return self.summary
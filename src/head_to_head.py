@@ -0,0 +1,178 @@
+"""
+Confrontations directes entre joueurs (face à face).
+
+Pour chaque paire de joueurs (i, j) ayant joué le même match, on compte les
+matchs où i a fini devant j (victoire), derrière (défaite) ou au même rang
+(égalité), et l'ELO que i a pris à j : sa part du delta ELO due à j,
+K × (résultat − score attendu) / (P − 1), comme dans compute_elo_deltas.
+
+Les matrices joueurs × joueurs sont calculées avec NumPy à partir de toutes
+les lignes de match_ranking, lues en une fois, puis gardées dans le cache
+applicatif ; chaque match enregistré y est ajouté sur place
+(record_match_ranking), sans relire la base.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.cache import HEAD_TO_HEAD, cached, get_cache
+from src.storage import get_storage
+from utils import ELO_DIVISOR, ELO_K_FACTOR, get_player_directory
+
+HEAD_TO_HEAD_TTL = 24 * 3600
+
+
+def pairwise_results(
+        match_ids: np.ndarray,
+        ranks: np.ndarray,
+        elos: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calcule les résultats de toutes les paires (i, j) de joueurs d'un même match.
+
+    Args:
+        match_ids: Match de chaque ligne, lignes d'un même match consécutives
+        ranks: Rang de chaque ligne
+        elos: ELO avant le match de chaque ligne
+
+    Returns:
+        Tuple (index de la ligne i, index de la ligne j, score de i contre j
+        (1, 0,5 ou 0), ELO pris par i à j), une entrée par paire ordonnée
+    """
+    # Début et taille du match de chaque ligne.
+    boundaries = np.flatnonzero(np.diff(match_ids)) + 1
+    starts = np.concatenate(([0], boundaries))
+    sizes = np.diff(np.concatenate((starts, [len(match_ids)])))
+    row_sizes = np.repeat(sizes, sizes)
+    row_starts = np.repeat(starts, sizes)
+
+    # Chaque ligne est associée à toutes les lignes de son match, sauf elle-même.
+    left = np.repeat(np.arange(len(match_ids)), row_sizes)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(row_sizes) - row_sizes, row_sizes)
+    right = np.repeat(row_starts, row_sizes) + offsets
+    pairs = left != right
+    left, right = left[pairs], right[pairs]
+
+    score = (np.sign(ranks[right] - ranks[left]) + 1) / 2
+    expected = 1 / (1 + 10 ** ((elos[right] - elos[left]) / ELO_DIVISOR))
+    elo_taken = ELO_K_FACTOR * (score - expected) / (row_sizes[left] - 1)
+    return left, right, score, elo_taken
+
+
+class HeadToHead:
+    """
+    Matrices des confrontations directes, indexées par player_index.
+
+    games[i, j] : matchs joués ensemble ; wins[i, j] : matchs où i a fini
+    devant j (les défaites de i sont wins[j, i]) ; ties[i, j] : même rang ;
+    elo_taken[i, j] : ELO cumulé pris par i à j (matrice antisymétrique).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.player_index: Dict[int, int] = {}
+        self.games = np.zeros((0, 0), dtype=np.int32)
+        self.wins = np.zeros((0, 0), dtype=np.int32)
+        self.ties = np.zeros((0, 0), dtype=np.int32)
+        self.elo_taken = np.zeros((0, 0), dtype=np.float64)
+
+    @classmethod
+    def load(cls) -> "HeadToHead":
+        """Construit les matrices à partir de toutes les lignes de match_ranking (une lecture)."""
+        head_to_head = cls()
+        head_to_head.add_rows(get_storage().list_match_ranking())
+        return head_to_head
+
+    def _indices(self, player_ids: np.ndarray) -> np.ndarray:
+        """Retourne l'index de chaque joueur, en agrandissant les matrices pour les nouveaux."""
+        for player_id in np.unique(player_ids).tolist():
+            self.player_index.setdefault(player_id, len(self.player_index))
+
+        size = len(self.player_index)
+        if size > len(self.games):
+            grown = len(self.games)
+            for name in ("games", "wins", "ties", "elo_taken"):
+                matrix = getattr(self, name)
+                resized = np.zeros((size, size), dtype=matrix.dtype)
+                resized[:grown, :grown] = matrix
+                setattr(self, name, resized)
+
+        return np.array([self.player_index[player_id] for player_id in player_ids.tolist()], dtype=np.int64)
+
+    def add_rows(self, rows: List[Dict]) -> None:
+        """
+        Ajoute des matchs aux matrices.
+
+        Args:
+            rows: Lignes {match_id, player_id, rank, old_elo} de match_ranking,
+                celles d'un même match consécutives
+        """
+        if not rows:
+            return
+        match_ids = np.array([row["match_id"] for row in rows], dtype=np.int64)
+        player_ids = np.array([row["player_id"] for row in rows], dtype=np.int64)
+        ranks = np.array([row["rank"] for row in rows], dtype=np.int64)
+        elos = np.array([row["old_elo"] for row in rows], dtype=np.float64)
+
+        left, right, score, elo_taken = pairwise_results(match_ids, ranks, elos)
+
+        with self._lock:
+            indices = self._indices(player_ids)
+            size = len(self.games)
+            # Index aplati de chaque paire dans les matrices, accumulé avec bincount.
+            cells = indices[left] * size + indices[right]
+            self.games += np.bincount(cells, minlength=size * size).reshape(size, size).astype(np.int32)
+            self.wins += np.bincount(cells, weights=score == 1, minlength=size * size).reshape(size, size).astype(np.int32)
+            self.ties += np.bincount(cells, weights=score == 0.5, minlength=size * size).reshape(size, size).astype(np.int32)
+            self.elo_taken += np.bincount(cells, weights=elo_taken, minlength=size * size).reshape(size, size)
+
+    def to_frames(self, player_ids: List[int]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Retourne les tableaux à afficher pour les joueurs donnés.
+
+        Args:
+            player_ids: Joueurs en lignes et en colonnes
+
+        Returns:
+            Tuple (bilans "victoires-défaites-égalités" de la ligne contre la
+            colonne, ELO moyen pris par la ligne à la colonne par match)
+        """
+        with self._lock:
+            known = [player_id for player_id in player_ids if player_id in self.player_index]
+            indices = np.array([self.player_index[player_id] for player_id in known], dtype=np.int64)
+            grid = np.ix_(indices, indices)
+            games, wins, ties, elo_taken = self.games[grid], self.wins[grid], self.ties[grid], self.elo_taken[grid]
+
+        losses = wins.T
+        record = np.char.add(np.char.add(np.char.add(np.char.add(
+            wins.astype(str), "-"), losses.astype(str)), "-"), ties.astype(str))
+        record[games == 0] = ""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average_elo = np.where(games > 0, elo_taken / games, np.nan)
+
+        directory = get_player_directory()
+        names = [directory.get_name(player_id) for player_id in known]
+        return (
+            pd.DataFrame(record, index=names, columns=names),
+            pd.DataFrame(average_elo.round(2), index=names, columns=names),
+        )
+
+
+@cached("head_to_head", HEAD_TO_HEAD_TTL, tags=lambda: (HEAD_TO_HEAD,))
+def get_head_to_head() -> HeadToHead:
+    """Retourne les confrontations directes partagées par le processus."""
+    return HeadToHead.load()
+
+
+def record_match_ranking(ranking_rows: List[Dict]) -> None:
+    """
+    Ajoute le classement d'un match enregistré aux confrontations en cache.
+
+    Sans effet si elles ne sont pas chargées : elles seront construites
+    depuis la base, match compris, au prochain affichage.
+    """
+    head_to_head: Optional[HeadToHead] = get_cache().peek("head_to_head", ())
+    if head_to_head is not None:
+        head_to_head.add_rows(ranking_rows)
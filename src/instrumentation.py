@@ -0,0 +1,195 @@
+"""
+Instrumentation des appels au stockage.
+
+Chaque appel à une méthode d'un Storage est mesuré : table, opération,
+nombre de lignes, latence et fonction appelante. Les appels faits pendant
+une réexécution d'une page (callbacks compris) sont regroupés dans la
+session ; report_db_calls, appelée en fin de page, en émet un résumé en
+log structuré (JSON) et l'affiche dans la barre latérale, avec les
+compteurs du cache applicatif, si la page est ouverte avec ?debug=1. Les
+réexécutions limitées à un fragment sont résumées par
+report_fragment_db_calls, appelée en fin de fragment.
+
+Les appels répétés depuis la même fonction (motif N+1) sont signalés.
+"""
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import streamlit as st
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from src.cache import get_cache
+
+logger = get_logger(__name__)
+
+SESSION_KEY = "db_calls"
+DEBUG_QUERY_PARAM = "debug"
+N_PLUS_ONE_THRESHOLD = 5
+
+# Cadres ignorés pour trouver la fonction appelante.
+_SKIPPED_FILES = {
+    os.path.join("src", "instrumentation.py"),
+    os.path.join("src", "storage.py"),
+    os.path.join("src", "io_pool.py"),
+    os.path.join("concurrent", "futures", "thread.py"),
+    "threading.py",
+    "functools.py",
+}
+
+
+@dataclass
+class DbCall:
+    """Un appel au stockage."""
+    method: str
+    table: str
+    operation: str
+    rows: int
+    latency_ms: float
+    caller: str
+    error: Optional[str] = None
+
+
+def _find_caller() -> str:
+    """Retourne la première fonction de l'application hors stockage et pool d'entrées/sorties."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not any(filename.endswith(skipped) for skipped in _SKIPPED_FILES):
+            module = frame.f_globals.get("__name__", "")
+            if module == "__main__":
+                module = os.path.splitext(os.path.basename(filename))[0]
+            return f"{module}.{frame.f_code.co_qualname}"
+        frame = frame.f_back
+    return "?"
+
+
+def _count_rows(args, result) -> int:
+    """Lignes lues (résultat) ou écrites (listes passées en argument)."""
+    if isinstance(result, list):
+        return len(result)
+    return sum(len(arg) for arg in args if isinstance(arg, list))
+
+
+def _record(call: DbCall) -> None:
+    """Ajoute un appel aux appels de la réexécution en cours (s'il y en a une) et au log."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({"event": "db_call", **asdict(call)}, ensure_ascii=False))
+    if get_script_run_ctx(suppress_warning=True) is None:
+        # Thread sans session (écrivain d'événements, scripts) : log seulement.
+        return
+    st.session_state.setdefault(SESSION_KEY, []).append(call)
+
+
+def instrumented(table: str, operation: str):
+    """
+    Décorateur mesurant une méthode de Storage.
+
+    Args:
+        table: Table principale concernée
+        operation: Opération (select, insert, upsert, rpc...)
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            caller = _find_caller()
+            start = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception as e:
+                _record(DbCall(method.__name__, table, operation, 0,
+                               (time.perf_counter() - start) * 1000, caller, type(e).__name__))
+                raise
+            _record(DbCall(method.__name__, table, operation, _count_rows(args, result),
+                           (time.perf_counter() - start) * 1000, caller))
+            return result
+        return wrapper
+    return decorator
+
+
+def summarize_db_calls(calls: List[DbCall]) -> Dict:
+    """
+    Résume une liste d'appels : nombre, latence cumulée, détail par méthode
+    et motifs N+1 (même méthode appelée au moins N_PLUS_ONE_THRESHOLD fois
+    depuis la même fonction).
+    """
+    by_call = Counter(f"{call.table}.{call.operation}" for call in calls)
+    repeated = Counter((call.method, call.caller) for call in calls)
+    return {
+        "calls": len(calls),
+        "total_ms": round(sum(call.latency_ms for call in calls), 1),
+        "rows": sum(call.rows for call in calls),
+        "errors": sum(call.error is not None for call in calls),
+        "by_call": dict(by_call),
+        "n_plus_one": [
+            {"method": method, "caller": caller, "count": count}
+            for (method, caller), count in repeated.items()
+            if count >= N_PLUS_ONE_THRESHOLD
+        ],
+    }
+
+
+def report_db_calls(page: str, scope: str = "app") -> Dict:
+    """
+    Émet le résumé des appels au stockage de la réexécution, puis le remet à zéro.
+
+    À appeler en fin de page : les appels des callbacks de la réexécution
+    suivante seront comptés avec elle.
+
+    Args:
+        page: Nom de la page, repris dans le log
+        scope: "app" pour une réexécution de la page, "fragment" pour celle
+            d'un fragment (le détail est alors affiché dans le fragment, qui
+            ne peut pas écrire dans la barre latérale)
+
+    Returns:
+        Résumé (voir summarize_db_calls)
+    """
+    calls = st.session_state.get(SESSION_KEY, [])
+    st.session_state[SESSION_KEY] = []
+    summary = summarize_db_calls(calls)
+
+    logger.info(json.dumps({"event": "rerun_db_calls", "page": page, "scope": scope, **summary}, ensure_ascii=False))
+    for pattern in summary["n_plus_one"]:
+        logger.warning("Motif N+1 : %s appelé %d fois depuis %s", pattern["method"], pattern["count"], pattern["caller"])
+
+    if st.query_params.get(DEBUG_QUERY_PARAM) == "1":
+        container = st.sidebar if scope == "app" else st
+        with container.expander("Base de données", expanded=scope == "app"):
+            st.caption(f"{summary['calls']} appels, {summary['total_ms']:.0f} ms, {summary['rows']} lignes")
+            for pattern in summary["n_plus_one"]:
+                st.warning(f"N+1 : {pattern['method']} × {pattern['count']} depuis {pattern['caller']}")
+            if calls:
+                st.dataframe([asdict(call) for call in calls], hide_index=True)
+            cache_stats = get_cache().stats()
+            if cache_stats:
+                st.caption("Cache applicatif")
+                st.dataframe(
+                    [{"espace": namespace, **counters} for namespace, counters in cache_stats.items()],
+                    hide_index=True,
+                )
+
+    return summary
+
+
+def report_fragment_db_calls(page: str) -> Optional[Dict]:
+    """
+    Émet le résumé des appels au stockage si la réexécution en cours est
+    limitée à un fragment. À appeler en fin de fragment ; lors d'une
+    réexécution complète, les appels du fragment sont résumés avec ceux de
+    la page par report_db_calls.
+
+    Returns:
+        Résumé, ou None pendant une réexécution complète
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None or not ctx.fragment_ids_this_run:
+        return None
+    return report_db_calls(page, scope="fragment")
@@ -0,0 +1,87 @@
+"""
+Exécution des entrées/sorties vers la base de données.
+
+Un pool de threads borné, partagé par le processus, exécute en parallèle
+les requêtes indépendantes d'une page (la latence devient celle de la plus
+lente plutôt que leur somme). Les lectures idempotentes du stockage sont
+retentées avec un délai exponentiel borné en cas d'erreur réseau ou de
+base occupée ; les écritures ne le sont jamais.
+"""
+import functools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, TypeVar
+
+import streamlit as st
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+IO_MAX_WORKERS = 8
+IO_THREAD_PREFIX = "io"
+
+# Délais par requête (secondes), appliqués par le client HTTP ou par SQLite.
+REQUEST_TIMEOUT = 10.0
+CONNECT_TIMEOUT = 5.0
+
+READ_RETRIES = 3
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+
+
+@st.cache_resource
+def get_io_executor() -> ThreadPoolExecutor:
+    """Retourne le pool de threads d'entrées/sorties partagé par le processus."""
+    return ThreadPoolExecutor(max_workers=IO_MAX_WORKERS, thread_name_prefix=IO_THREAD_PREFIX)
+
+
+def run_concurrently(*calls: Callable[[], T]) -> List[T]:
+    """
+    Exécute des appels indépendants en parallèle sur le pool d'entrées/sorties.
+
+    Le contexte Streamlit de la session est transmis aux threads (fonctions
+    en cache). Appelée depuis un thread du pool, elle exécute les appels en
+    série pour ne jamais bloquer le pool sur lui-même.
+
+    Returns:
+        Résultats des appels, dans l'ordre ; la première erreur est propagée
+    """
+    if len(calls) <= 1 or threading.current_thread().name.startswith(IO_THREAD_PREFIX):
+        return [call() for call in calls]
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+
+    def run(call: Callable[[], T]) -> T:
+        if ctx is not None:
+            add_script_run_ctx(ctx=ctx)
+        return call()
+
+    executor = get_io_executor()
+    futures = [executor.submit(run, call) for call in calls]
+    return [future.result() for future in futures]
+
+
+def retry_read(method):
+    """
+    Décorateur des lectures idempotentes d'un stockage : les erreurs listées
+    dans retryable_errors du stockage sont retentées READ_RETRIES fois, avec
+    un délai exponentiel borné et aléatoire.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for attempt in range(READ_RETRIES + 1):
+            try:
+                return method(self, *args, **kwargs)
+            except self.retryable_errors as e:
+                if attempt == READ_RETRIES:
+                    raise
+                delay = min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY) * random.uniform(0.5, 1.0)
+                logger.warning("%s en échec (tentative %d), reprise dans %.2f s : %s",
+                               method.__name__, attempt + 1, delay, e)
+                time.sleep(delay)
+    return wrapper
@@ -0,0 +1,91 @@
+"""
+Suivi et plafond de la mémoire occupée par les parties gardées en session.
+
+Chaque onglet garde en st.session_state la partie en cours et les parties
+consultées dans l'historique. La taille de ces parties est estimée
+(CricketGame.memory_size) et les parties de l'historique qui ne sont plus
+affichées sont libérées, des plus anciennes aux plus récentes, dès que la
+session dépasse son plafond, configurable dans .streamlit/secrets.toml :
+
+    [session]
+    max_memory_kb = 1024
+"""
+import sys
+from typing import Dict, Iterable, List
+
+import streamlit as st
+from streamlit.logger import get_logger
+
+from src.game import CricketGame
+
+logger = get_logger(__name__)
+
+DEFAULT_SESSION_MEMORY_KB = 1024
+
+
+def get_session_memory_budget() -> int:
+    """Retourne le plafond mémoire des parties d'une session, en octets."""
+    try:
+        config = st.secrets.get("session", {})
+    except FileNotFoundError:
+        config = {}
+    return int(config.get("max_memory_kb", DEFAULT_SESSION_MEMORY_KB)) * 1024
+
+
+def estimate_size(value) -> int:
+    """Estime la taille d'une valeur de session : parties, et conteneurs de parties."""
+    if isinstance(value, CricketGame):
+        return value.memory_size()
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def session_memory_report() -> Dict[str, int]:
+    """Retourne la taille estimée de chaque entrée de la session, en octets."""
+    return {str(key): estimate_size(value) for key, value in st.session_state.items()}
+
+
+def log_session_memory() -> int:
+    """Journalise (niveau debug) la mémoire estimée de la session et retourne son total."""
+    report = session_memory_report()
+    total = sum(report.values())
+    largest = sorted(report.items(), key=lambda item: item[1], reverse=True)[:3]
+    logger.debug("Mémoire de la session : %.1f Kio (%s)", total / 1024,
+                 ", ".join(f"{key} {size / 1024:.1f} Kio" for key, size in largest))
+    return total
+
+
+def enforce_memory_budget(games: Dict[int, CricketGame], keep: Iterable[int]) -> List[int]:
+    """
+    Libère des parties d'un cache de session jusqu'à repasser sous le plafond.
+
+    Les parties sont libérées dans leur ordre d'insertion (les plus anciennes
+    d'abord) ; celles de keep, affichées dans la réexécution courante, sont
+    conservées même si le plafond reste dépassé.
+
+    Args:
+        games: Cache {match_id: partie} modifié sur place
+        keep: IDs des parties à conserver
+
+    Returns:
+        IDs des parties libérées
+    """
+    budget = get_session_memory_budget()
+    total = sum(session_memory_report().values())
+    keep = set(keep)
+    evicted = []
+
+    for match_id in list(games):
+        if total <= budget:
+            break
+        if match_id in keep:
+            continue
+        total -= games.pop(match_id).memory_size()
+        evicted.append(match_id)
+
+    if evicted:
+        logger.debug("%d parties libérées de la session (plafond %d Kio)", len(evicted), budget // 1024)
+    return evicted
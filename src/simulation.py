@@ -0,0 +1,303 @@
+"""
+Estimation des probabilités de victoire par simulation Monte-Carlo.
+
+À partir de l'état courant d'une partie, des milliers de fins de partie sont
+simulées en parallèle sous forme de tableaux NumPy (simulations × joueurs ×
+cibles), avec les mêmes règles de fermeture, de points en surplus et de fin
+de match que CricketGame.throw.
+
+Modèle de lancer : chaque joueur vise sa première cible non fermée (puis,
+une fois tout fermé, la cible encore ouverte chez le plus d'adversaires),
+la touche avec sa probabilité de réussite, et obtient simple, double ou
+triple selon sa propre répartition des multiplicateurs.
+
+Le calcul est fait à chaque fléchette : le nombre de simulations diminue
+avec le nombre de fléchettes restantes pour viser TARGET_LATENCY, d'après
+un coût mesuré par benchmarks.run. Le travail ne dépend que de l'état de la
+partie, jamais de la charge de la machine : le résultat peut être mis en
+cache.
+"""
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import streamlit as st
+
+from src.cache import cached, player_history_tag
+from src.dart_codec import decode_darts
+from src.game import CricketGame, GameConfig
+from src.io_pool import run_concurrently
+from src.storage import get_storage
+from utils import get_player_directory
+
+NUM_SIMULATIONS = 1000
+# Écart type de l'estimation d'au plus 2,5 points (0,5 / √400).
+MIN_SIMULATIONS = 400
+# Coût d'une estimation, mesuré par benchmarks.run (win_probabilities) :
+# STEP_COST par fléchette simulée, plus SIMULATION_STEP_COST par simulation
+# et par fléchette.
+STEP_COST = 70e-6
+SIMULATION_STEP_COST = 0.18e-6
+TARGET_LATENCY = 0.02
+
+# Estimation des taux de réussite à partir des fléchettes encodées
+# (matches.darts) des derniers matchs de chaque joueur, lissée par un a priori
+# équivalent à deux parties moyennes.
+HISTORY_SAMPLE_MATCHES = 20
+HIT_RATES_TTL = 24 * 3600
+PRIOR_HIT_RATE = 0.25
+PRIOR_DARTS = 120
+PRIOR_MULTIPLIER_PROBS = np.array([0.75, 0.15, 0.10])
+PRIOR_HITS = PRIOR_HIT_RATE * PRIOR_DARTS
+MIN_HIT_RATE = 0.02
+MAX_HIT_RATE = 0.95
+
+
+@cached("dart_rates", HIT_RATES_TTL, tags=lambda player_id: (player_history_tag(player_id),))
+def estimate_dart_rates(player_id: int) -> Tuple[float, Tuple[float, float, float]]:
+    """
+    Estime la probabilité de toucher et la répartition des multiplicateurs d'un joueur,
+    à partir des fléchettes qu'il a réellement lancées dans ses derniers matchs.
+
+    Les matchs enregistrés sans leurs fléchettes (antérieurs à matches.darts)
+    ne comptent pas ; sans aucun match, l'a priori est retourné.
+
+    Args:
+        player_id: ID du joueur
+
+    Returns:
+        Tuple (probabilité de toucher, probabilités simple/double/triple)
+    """
+    storage = get_storage()
+    matches = storage.list_finished_matches(HISTORY_SAMPLE_MATCHES, desc=True, player_id=player_id)
+    darts = 0
+    multiplier_counts = np.zeros(3)
+    for row in storage.get_match_darts([match["id"] for match in matches]):
+        player_ids, target_indices, multipliers = decode_darts(row["darts"])
+        thrower = (np.arange(len(target_indices)) // GameConfig.DARTS_PER_ROUND) % len(player_ids)
+        own = thrower == player_ids.index(player_id)
+        hits = own & (target_indices != GameConfig.MISS_INDEX)
+        darts += int(own.sum())
+        multiplier_counts += np.bincount(multipliers[hits] - 1, minlength=3)[:3]
+
+    num_hits = multiplier_counts.sum()
+    hit_rate = float(np.clip((num_hits + PRIOR_HITS) / (darts + PRIOR_DARTS), MIN_HIT_RATE, MAX_HIT_RATE))
+    multiplier_probs = (multiplier_counts + PRIOR_MULTIPLIER_PROBS * PRIOR_HITS) / (num_hits + PRIOR_HITS)
+    return hit_rate, tuple(float(prob) for prob in multiplier_probs)
+
+
+def get_num_simulations(remaining_darts: int) -> int:
+    """
+    Nombre de simulations tenant dans TARGET_LATENCY pour les fléchettes restantes,
+    entre MIN_SIMULATIONS et NUM_SIMULATIONS.
+
+    En début de partie à quatre joueurs ou plus, MIN_SIMULATIONS dépasse
+    TARGET_LATENCY (environ 50 ms à six joueurs) : la précision est préférée.
+    """
+    per_simulation = (TARGET_LATENCY / max(remaining_darts, 1) - STEP_COST) / SIMULATION_STEP_COST
+    return int(np.clip(per_simulation, MIN_SIMULATIONS, NUM_SIMULATIONS))
+
+
+class SimulationBatch:
+    """
+    Lot de parties simulées en parallèle.
+
+    Les marques sont stockées en (simulations × joueurs × cibles) pour que les
+    accès par joueur soient contigus ; le nombre de cibles fermées par joueur
+    et le nombre de joueurs encore ouverts par cible sont tenus à jour à
+    chaque fléchette plutôt que recalculés.
+
+    Attributes:
+        state: Marques (simulations × joueurs × cibles)
+        points: Points (simulations × joueurs)
+        closed_count: Nombre de cibles fermées (simulations × joueurs)
+        open_count: Nombre de joueurs n'ayant pas fermé la cible (simulations × cibles)
+        active: Simulations encore en cours
+    """
+
+    def __init__(self, state: np.ndarray, points: np.ndarray, num_simulations: int):
+        """
+        Args:
+            state: Marques de départ (cibles × joueurs), comme CricketGame.state
+            points: Points de départ des joueurs
+            num_simulations: Nombre de parties simulées
+        """
+        closed = state.T == GameConfig.MAX_SCORE_PER_TARGET
+        self.state = np.repeat(state.T[np.newaxis].astype(np.int8), num_simulations, axis=0)
+        self.points = np.repeat(points[np.newaxis].astype(np.int64), num_simulations, axis=0)
+        self.closed_count = np.repeat(closed.sum(axis=1)[np.newaxis], num_simulations, axis=0)
+        self.open_count = np.repeat((~closed).sum(axis=0)[np.newaxis], num_simulations, axis=0)
+        self.active = np.ones(num_simulations, dtype=bool)
+
+    def choose_aim(self, player_idx: int) -> np.ndarray:
+        """Retourne la cible visée par le joueur dans chaque simulation."""
+        own_open = self.state[:, player_idx, :] < GameConfig.MAX_SCORE_PER_TARGET
+        first_open = own_open.argmax(axis=1)
+        best_scoring = (self.open_count - own_open).argmax(axis=1)
+        return np.where(self.closed_count[:, player_idx] < len(GameConfig.TARGETS), first_open, best_scoring)
+
+    def throw(self, player_idx: int, aim: np.ndarray, marks: np.ndarray) -> None:
+        """
+        Applique une fléchette du joueur player_idx à chaque simulation active.
+
+        Args:
+            player_idx: Joueur qui lance
+            aim: Index de la cible touchée, par simulation
+            marks: Nombre de marques obtenues (0 = raté), par simulation
+        """
+        sims = np.flatnonzero(self.active & (marks > 0))
+        if sims.size == 0:
+            return
+        targets = aim[sims]
+
+        previous_score = self.state[sims, player_idx, targets]
+        new_score = previous_score + marks[sims]
+        overflow = np.maximum(new_score - GameConfig.MAX_SCORE_PER_TARGET, 0)
+        added_points = overflow * GameConfig.TARGET_VALUES[targets]
+
+        open_players = self.state[sims, :, targets] < GameConfig.MAX_SCORE_PER_TARGET
+        open_players[:, player_idx] = False
+        self.points[sims] += added_points[:, np.newaxis] * open_players
+
+        self.state[sims, player_idx, targets] = np.minimum(new_score, GameConfig.MAX_SCORE_PER_TARGET)
+
+        newly_closed = (previous_score < GameConfig.MAX_SCORE_PER_TARGET) & (
+                new_score >= GameConfig.MAX_SCORE_PER_TARGET)
+        self.closed_count[sims[newly_closed], player_idx] += 1
+        self.open_count[sims[newly_closed], targets[newly_closed]] -= 1
+
+    def winners(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retourne les simulations actives où un joueur vient de gagner
+        (toutes les cibles fermées et strictement moins de points que les autres).
+
+        Returns:
+            Tuple (index des simulations, joueur gagnant de chacune)
+        """
+        all_closed = self.closed_count == len(GameConfig.TARGETS)
+        sims = np.flatnonzero(self.active & all_closed.any(axis=1))
+        if sims.size == 0:
+            return sims, sims
+
+        points = self.points[sims]
+        lowest = points.argmin(axis=1)
+        lowest_points = points[np.arange(sims.size), lowest]
+        unique_lowest = (points == lowest_points[:, np.newaxis]).sum(axis=1) == 1
+        won = unique_lowest & all_closed[sims, lowest]
+        return sims[won], lowest[won]
+
+
+def simulate_win_probabilities(
+        state: np.ndarray,
+        points: np.ndarray,
+        actual_dart: int,
+        total_dart_number: int,
+        hit_rates: np.ndarray,
+        multiplier_probs: np.ndarray,
+        num_simulations: int = NUM_SIMULATIONS,
+        seed: int = 0
+) -> np.ndarray:
+    """
+    Simule en parallèle la fin d'une partie et retourne la probabilité de victoire de chaque joueur.
+
+    Un match terminé au nombre maximal de fléchettes est gagné par le(s)
+    joueur(s) ayant le moins de points, à parts égales en cas d'égalité.
+
+    Les victoires ne sont cherchées qu'en fin de tour : les fléchettes qui
+    suivent une victoire dans le même tour ne peuvent qu'ajouter des points
+    aux adversaires du gagnant, le résultat est donc le même.
+
+    Args:
+        state: Marques actuelles (cibles × joueurs)
+        points: Points actuels des joueurs
+        actual_dart: Numéro de la prochaine fléchette (1 = première)
+        total_dart_number: Nombre total de fléchettes du match
+        hit_rates: Probabilité de toucher la cible visée, par joueur
+        multiplier_probs: Probabilités simple/double/triple d'une fléchette touchée (joueurs × 3)
+        num_simulations: Nombre de parties simulées
+        seed: Graine du générateur aléatoire
+
+    Returns:
+        Vecteur des probabilités de victoire, dans l'ordre des joueurs
+    """
+    rng = np.random.default_rng(seed)
+    num_players = len(points)
+    num_darts = max(total_dart_number - actual_dart + 1, 0)
+
+    batch = SimulationBatch(state, points, num_simulations)
+    wins = np.zeros((num_simulations, num_players))
+
+    # Tirages de toutes les fléchettes restantes en une fois : 0 = raté, sinon nombre de marques
+    # (1 + nombre de seuils cumulés du lanceur dépassés).
+    players = ((actual_dart + np.arange(num_darts) - 1) // GameConfig.DARTS_PER_ROUND) % num_players
+    thresholds = np.cumsum(multiplier_probs, axis=1)[players, :2]
+    draws = rng.random((num_darts, num_simulations))
+    multipliers = 1 + (rng.random((num_darts, num_simulations))[..., np.newaxis] > thresholds[:, np.newaxis, :]).sum(axis=2)
+    marks = np.where(draws < hit_rates[players][:, np.newaxis], multipliers, 0).astype(np.int8)
+
+    for step in range(num_darts):
+        player_idx = players[step]
+        batch.throw(player_idx, batch.choose_aim(player_idx), marks[step])
+
+        if (actual_dart + step) % GameConfig.DARTS_PER_ROUND and step < num_darts - 1:
+            continue
+        sims, winners = batch.winners()
+        wins[sims, winners] = 1
+        batch.active[sims] = False
+        if not batch.active.any():
+            break
+
+    if batch.active.any():
+        remaining = batch.points[batch.active]
+        lowest = remaining == remaining.min(axis=1, keepdims=True)
+        wins[batch.active] = lowest / lowest.sum(axis=1, keepdims=True)
+
+    return wins.mean(axis=0)
+
+
+@st.cache_data(max_entries=512)
+def _cached_win_probabilities(
+        state: np.ndarray,
+        points: np.ndarray,
+        actual_dart: int,
+        total_dart_number: int,
+        hit_rates: Tuple[float, ...],
+        multiplier_probs: Tuple[Tuple[float, float, float], ...],
+        num_simulations: int
+) -> List[float]:
+    seed = zlib.crc32(state.tobytes() + points.tobytes() + actual_dart.to_bytes(4, "little"))
+    return simulate_win_probabilities(
+        state, points, actual_dart, total_dart_number, np.array(hit_rates), np.array(multiplier_probs),
+        num_simulations, seed
+    ).tolist()
+
+
+def get_win_probabilities(game: CricketGame, num_simulations: Optional[int] = None) -> Dict[str, float]:
+    """
+    Retourne la probabilité de victoire de chaque joueur pour l'état actuel de la partie.
+
+    Le résultat est mis en cache par état : revenir sur un état déjà vu
+    (annulation) ne relance pas la simulation. Par défaut, le nombre de
+    simulations dépend des fléchettes restantes (get_num_simulations).
+    """
+    if game.match_ended:
+        ranking = game.get_ranking()
+        winners = next(iter(ranking.values()))
+        return {player: (1 / len(winners) if player in winners else 0.0) for player in game.player_list}
+
+    directory = get_player_directory()
+    rates = run_concurrently(*(
+        lambda player_id=directory.get_id(player): estimate_dart_rates(player_id) for player in game.player_list
+    ))
+    if num_simulations is None:
+        num_simulations = get_num_simulations(game.total_dart_number - game.actual_dart + 1)
+    probabilities = _cached_win_probabilities(
+        game.state,
+        game.points,
+        game.actual_dart,
+        game.total_dart_number,
+        tuple(hit_rate for hit_rate, _ in rates),
+        tuple(multiplier_probs for _, multiplier_probs in rates),
+        num_simulations
+    )
+    return dict(zip(game.player_list, probabilities))
@@ -0,0 +1,80 @@
+"""
+Statistiques agrégées par joueur (table player_stats).
+
+La table est mise à jour de façon incrémentale à chaque match enregistré
+(CricketGame.state_to_base, dans la même transaction que le match). Cette
+commande la reconstruit entièrement à partir des matchs terminés, page par
+page, par exemple après sa création ou une correction manuelle en base.
+
+Usage :
+    python -m src.stats [--page-size 100]
+"""
+import argparse
+from typing import Dict, List, Optional
+
+from src.cache import PLAYER_STATS, ROSTER, cached, get_cache
+from src.game import merge_player_stats, player_stats_from_rows
+from src.io_pool import run_concurrently
+from src.storage import Storage, get_storage, iter_finished_match_pages
+from utils import get_player_directory
+
+DEFAULT_PAGE_SIZE = 100
+PLAYER_STATS_TTL = 300
+
+
+def compute_player_stats(storage: Storage, page_size: int = DEFAULT_PAGE_SIZE) -> Dict[int, Dict]:
+    """
+    Recalcule les statistiques de tous les joueurs à partir des matchs terminés.
+
+    Chaque page coûte quatre requêtes (matches, puis match_state, match_points
+    et match_ranking en parallèle) et seule la page courante est gardée en mémoire.
+
+    Args:
+        storage: Stockage à parcourir
+        page_size: Nombre de matchs lus par page
+
+    Returns:
+        Dictionnaire {player_id: ligne player_stats}
+    """
+    totals: Dict[int, Dict] = {}
+    for matches in iter_finished_match_pages(storage, page_size):
+        match_ids = [match["id"] for match in matches]
+        merge_player_stats(totals, player_stats_from_rows(*run_concurrently(
+            lambda: storage.get_match_state(match_ids),
+            lambda: storage.get_match_points(match_ids),
+            lambda: storage.get_match_ranking(match_ids),
+        )))
+    return totals
+
+
+def rebuild_player_stats(storage: Storage, page_size: int = DEFAULT_PAGE_SIZE) -> Dict[int, Dict]:
+    """Recalcule et réécrit la table player_stats, puis invalide les statistiques en cache."""
+    stats = compute_player_stats(storage, page_size)
+    storage.replace_player_stats(list(stats.values()))
+    get_cache().invalidate(PLAYER_STATS)
+    return stats
+
+
+@cached("player_stats", PLAYER_STATS_TTL, tags=lambda: (PLAYER_STATS, ROSTER))
+def get_player_stats() -> List[Dict]:
+    """Retourne les statistiques des joueurs ayant joué au moins un match, avec leur nom."""
+    directory = get_player_directory()
+    return [
+        {"player_name": directory.get_name(row["player_id"]), **row}
+        for row in get_storage().list_player_stats()
+        if row["games"]
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Reconstruit la table player_stats.")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args(argv)
+
+    stats = rebuild_player_stats(get_storage(), args.page_size)
+    print(f"Statistiques reconstruites pour {len(stats)} joueurs "
+          f"({sum(entry['games'] for entry in stats.values())} participations).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,826 @@
+"""
+Accès aux données de l'application.
+
+Toutes les lectures et écritures sur les tables players, matches,
+match_state, match_points, match_ranking, match_events et player_stats
+passent par l'interface Storage. Deux implémentations existent : Supabase
+(par défaut) et SQLite, pour faire tourner l'application sur une machine locale.
+
+Le backend est choisi dans .streamlit/secrets.toml :
+
+    [storage]
+    backend = "sqlite"          # ou "supabase"
+    path = "popocricket.db"
+"""
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+import httpx
+import streamlit as st
+from postgrest.exceptions import APIError
+
+from src.cache import get_cache
+from src.instrumentation import instrumented
+from src.io_pool import CONNECT_TIMEOUT, IO_MAX_WORKERS, REQUEST_TIMEOUT, retry_read
+
+DEFAULT_ELO = 1000.0
+DEFAULT_SQLITE_PATH = "popocricket.db"
+# Nombre maximal de lignes renvoyées par requête par PostgREST (réglage « Max rows »
+# de Supabase, 1000 par défaut) : les lectures plus longues sont faites par tranches.
+# Ne doit pas dépasser le réglage du projet, sans quoi les tranches seraient tronquées.
+SUPABASE_MAX_ROWS = 1000
+
+# Compteurs additifs de la table player_stats (elo_peak est un maximum).
+PLAYER_STATS_COUNTERS = (
+    "games", "wins", "points_conceded",
+    "closed_20", "closed_19", "closed_18", "closed_17", "closed_16", "closed_15", "closed_25",
+)
+PLAYER_STATS_COLUMNS = ("player_id",) + PLAYER_STATS_COUNTERS + ("elo_peak",)
+
+# Écart toléré entre l'ELO de départ d'un match (old_elo) et celui en base au
+# moment de l'enregistrement, le même dans sql/save_match.sql.
+ELO_CHECK_TOLERANCE = 1e-3
+# Code d'erreur levé par sql/save_match.sql (réponse HTTP 409 de PostgREST).
+STALE_ELO_ERROR_CODE = "PT409"
+
+Cursor = Tuple[str, int]
+
+
+class StaleEloError(Exception):
+    """L'ELO d'un joueur a changé en base depuis le calcul des résultats du match."""
+
+# Table et opération de chaque méthode du stockage, pour l'instrumentation.
+STORAGE_CALLS: Dict[str, Tuple[str, str]] = {
+    "list_players": ("players", "select"),
+    "add_player": ("players", "insert"),
+    "update_player_elos": ("players", "upsert"),
+    "create_match": ("matches", "insert"),
+    "list_finished_matches": ("matches", "select"),
+    "list_unfinished_matches": ("matches", "select"),
+    "get_match_state": ("match_state", "select"),
+    "get_match_points": ("match_points", "select"),
+    "get_match_ranking": ("match_ranking", "select"),
+    "list_match_ranking": ("match_ranking", "select"),
+    "append_match_events": ("match_events", "insert"),
+    "get_match_events": ("match_events", "select"),
+    "discard_match": ("matches", "discard_match"),
+    "get_match_darts": ("matches", "select"),
+    "list_player_stats": ("player_stats", "select"),
+    "replace_player_stats": ("player_stats", "upsert"),
+    "save_match": ("matches", "save_match"),
+}
+
+
+class Storage(ABC):
+    """
+    Interface d'accès aux tables de l'application.
+
+    Les lectures sont idempotentes : les implémentations les décorent avec
+    retry_read, qui retente les erreurs listées dans retryable_errors.
+    Les méthodes de STORAGE_CALLS de chaque implémentation sont mesurées
+    automatiquement (voir src/instrumentation.py).
+    """
+
+    retryable_errors: Tuple[Type[BaseException], ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, (table, operation) in STORAGE_CALLS.items():
+            if name in cls.__dict__:
+                setattr(cls, name, instrumented(table, operation)(cls.__dict__[name]))
+
+    @abstractmethod
+    def list_players(self) -> List[Dict]:
+        """Retourne tous les joueurs {id, player_name, player_elo}."""
+
+    @abstractmethod
+    def add_player(self, player_name: str) -> None:
+        """Ajoute un joueur."""
+
+    @abstractmethod
+    def update_player_elos(self, players: List[Dict]) -> None:
+        """Met à jour en bloc l'ELO de joueurs existants {id, player_name, player_elo}."""
+
+    @abstractmethod
+    def create_match(self) -> int:
+        """Crée un match non terminé et retourne son ID."""
+
+    @abstractmethod
+    def list_finished_matches(
+            self,
+            limit: int,
+            cursor: Optional[Cursor] = None,
+            desc: bool = True,
+            since: Optional[str] = None,
+            until: Optional[str] = None,
+            player_id: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Retourne une page de matchs terminés {id, created_at}, triés par (created_at, id).
+
+        Args:
+            limit: Taille de la page
+            cursor: (created_at, id) de la dernière ligne de la page précédente
+            desc: Ordre décroissant (plus récents d'abord) si True
+            since: Date ISO incluse à partir de laquelle les matchs sont retenus
+            until: Date ISO exclue jusqu'à laquelle les matchs sont retenus
+            player_id: Ne retenir que les matchs auxquels ce joueur a participé
+        """
+
+    @abstractmethod
+    def list_unfinished_matches(self, limit: int) -> List[Dict]:
+        """Retourne les matchs non terminés {id, created_at}, plus récents d'abord."""
+
+    @abstractmethod
+    def get_match_state(self, match_ids: List[int]) -> List[Dict]:
+        """Retourne les lignes {match_id, player_id, target, score} des matchs donnés."""
+
+    @abstractmethod
+    def get_match_points(self, match_ids: List[int]) -> List[Dict]:
+        """Retourne les lignes {match_id, player_id, points} des matchs donnés."""
+
+    @abstractmethod
+    def get_match_ranking(self, match_ids: List[int]) -> List[Dict]:
+        """Retourne les lignes {match_id, player_id, rank, old_elo, new_elo, delta_elo} des matchs donnés."""
+
+    @abstractmethod
+    def list_match_ranking(self) -> List[Dict]:
+        """Retourne toutes les lignes {match_id, player_id, rank, old_elo} de match_ranking, triées par match_id."""
+
+    @abstractmethod
+    def append_match_events(self, events: List[Dict]) -> int:
+        """
+        Insère en bloc des événements {match_id, seq, event, value} (voir src/event_log.py),
+        datés de leur insertion (created_at).
+        Les événements déjà présents (même match_id et seq) sont ignorés.
+
+        Returns:
+            Nombre d'événements effectivement insérés
+        """
+
+    @abstractmethod
+    def get_match_events(self, match_ids: List[int]) -> List[Dict]:
+        """
+        Retourne les événements {match_id, seq, event, value, created_at} des matchs donnés,
+        triés par (match_id, seq).
+        """
+
+    @abstractmethod
+    def discard_match(self, match_id: int) -> None:
+        """Supprime un match non terminé et son journal de fléchettes (sans effet sur un match terminé)."""
+
+    @abstractmethod
+    def get_match_darts(self, match_ids: List[int]) -> List[Dict]:
+        """Retourne les fléchettes encodées {id, darts: bytes} des matchs donnés qui en ont (voir src/dart_codec.py)."""
+
+    @abstractmethod
+    def list_player_stats(self) -> List[Dict]:
+        """Retourne les statistiques agrégées de tous les joueurs (colonnes PLAYER_STATS_COLUMNS)."""
+
+    @abstractmethod
+    def replace_player_stats(self, stats: List[Dict]) -> None:
+        """Écrase les statistiques agrégées des joueurs donnés (reconstruction complète)."""
+
+    @abstractmethod
+    def save_match(
+            self,
+            match_id: int,
+            points: List[Dict],
+            state: List[Dict],
+            ranking: List[Dict],
+            stats: List[Dict],
+            darts: bytes
+    ) -> str:
+        """
+        Enregistre atomiquement un match terminé : points, état, classement,
+        nouveaux ELO des joueurs (new_elo du classement), fin du match,
+        fléchettes encodées (darts, sur la ligne matches) et compteurs du
+        match ajoutés aux statistiques des joueurs (stats). Le journal des
+        fléchettes du match (match_events), remplacé par darts, est supprimé.
+
+        Returns:
+            Date ISO de création du match (matches.created_at), celle de
+            l'historique ELO
+
+        Raises:
+            StaleEloError: Si l'ELO en base d'un joueur n'est plus son old_elo
+                (autre processus, correction manuelle, elo_replay --write) ;
+                rien n'est alors enregistré
+        """
+
+
+class SupabaseStorage(Storage):
+    """Stockage sur le projet Supabase hébergé."""
+
+    retryable_errors = (httpx.TransportError,)
+
+    def __init__(self, client):
+        self.client = client
+
+    @retry_read
+    def list_players(self) -> List[Dict]:
+        return self.client.table("players").select("id", "player_name", "player_elo").execute().data
+
+    def add_player(self, player_name: str) -> None:
+        self.client.table("players").insert([{"player_name": player_name}], count="None").execute()
+
+    def update_player_elos(self, players: List[Dict]) -> None:
+        if players:
+            self.client.table("players").upsert(players, on_conflict="id").execute()
+
+    def create_match(self) -> int:
+        response = self.client.table("matches").insert(
+            [{"is_finished": False}], count="None"
+        ).execute()
+        return response.data[0]['id']
+
+    @retry_read
+    def list_finished_matches(
+            self,
+            limit: int,
+            cursor: Optional[Cursor] = None,
+            desc: bool = True,
+            since: Optional[str] = None,
+            until: Optional[str] = None,
+            player_id: Optional[int] = None
+    ) -> List[Dict]:
+        columns = ("id", "created_at")
+        if player_id is not None:
+            # Jointure interne : seuls les matchs ayant une ligne de classement pour ce joueur.
+            columns += ("match_ranking!inner(player_id)",)
+        query = (
+            self.client
+            .table("matches")
+            .select(*columns)
+            .eq("is_finished", True)
+        )
+        if player_id is not None:
+            query = query.eq("match_ranking.player_id", player_id)
+        if since is not None:
+            query = query.gte("created_at", since)
+        if until is not None:
+            query = query.lt("created_at", until)
+        if cursor is not None:
+            # Pagination par clé : strictement après la dernière ligne lue.
+            created_at, match_id = cursor
+            op = "lt" if desc else "gt"
+            query = query.or_(
+                f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{match_id})'
+            )
+        rows = (
+            query
+            .order("created_at", desc=desc)
+            .order("id", desc=desc)
+            .limit(limit)
+            .execute()
+            .data
+        )
+        return [{"id": row["id"], "created_at": row["created_at"]} for row in rows]
+
+    @retry_read
+    def list_unfinished_matches(self, limit: int) -> List[Dict]:
+        return (
+            self.client
+            .table("matches")
+            .select("id", "created_at")
+            .eq("is_finished", False)
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(limit)
+            .execute()
+            .data
+        )
+
+    @staticmethod
+    def _select_all(build_query: Callable[[], object]) -> List[Dict]:
+        """
+        Lit toutes les lignes d'une requête, par tranches de SUPABASE_MAX_ROWS (.range()).
+
+        Args:
+            build_query: Construit la requête (filtres et tri total, pour des tranches stables)
+        """
+        rows = []
+        while True:
+            page = build_query().range(len(rows), len(rows) + SUPABASE_MAX_ROWS - 1).execute().data
+            rows.extend(page)
+            if len(page) < SUPABASE_MAX_ROWS:
+                return rows
+
+    def _select_matches(
+            self,
+            table: str,
+            columns: Tuple[str, ...],
+            key: Tuple[str, ...],
+            match_ids: List[int]
+    ) -> List[Dict]:
+        if not match_ids:
+            return []
+
+        def build_query():
+            query = self.client.table(table).select(*columns).in_("match_id", match_ids)
+            for column in key:
+                query = query.order(column)
+            return query
+
+        return self._select_all(build_query)
+
+    @retry_read
+    def get_match_state(self, match_ids: List[int]) -> List[Dict]:
+        return self._select_matches(
+            "match_state", ("match_id", "player_id", "target", "score"), ("match_id", "player_id", "target"), match_ids
+        )
+
+    @retry_read
+    def get_match_points(self, match_ids: List[int]) -> List[Dict]:
+        return self._select_matches(
+            "match_points", ("match_id", "player_id", "points"), ("match_id", "player_id"), match_ids
+        )
+
+    @retry_read
+    def get_match_ranking(self, match_ids: List[int]) -> List[Dict]:
+        return self._select_matches(
+            "match_ranking",
+            ("match_id", "player_id", "rank", "old_elo", "new_elo", "delta_elo"),
+            ("match_id", "player_id"),
+            match_ids
+        )
+
+    @retry_read
+    def list_match_ranking(self) -> List[Dict]:
+        return self._select_all(lambda: (
+            self.client
+            .table("match_ranking")
+            .select("match_id", "player_id", "rank", "old_elo")
+            .order("match_id")
+            .order("player_id")
+        ))
+
+    def append_match_events(self, events: List[Dict]) -> int:
+        if not events:
+            return 0
+        # Idempotent : un lot retenté après une erreur réseau n'est pas dupliqué.
+        # Seules les lignes insérées sont renvoyées.
+        return len(
+            self.client.table("match_events").upsert(
+                events, on_conflict="match_id,seq", ignore_duplicates=True
+            ).execute().data
+        )
+
+    @retry_read
+    def get_match_events(self, match_ids: List[int]) -> List[Dict]:
+        if not match_ids:
+            return []
+        return self._select_all(lambda: (
+            self.client
+            .table("match_events")
+            .select("match_id", "seq", "event", "value", "created_at")
+            .in_("match_id", match_ids)
+            .order("match_id")
+            .order("seq")
+        ))
+
+    def discard_match(self, match_id: int) -> None:
+        # Fonction Postgres transactionnelle, voir sql/discard_match.sql
+        self.client.rpc("discard_match", {"p_match_id": match_id}).execute()
+
+    @retry_read
+    def get_match_darts(self, match_ids: List[int]) -> List[Dict]:
+        if not match_ids:
+            return []
+        rows = (
+            self.client
+            .table("matches")
+            .select("id", "darts")
+            .in_("id", match_ids)
+            .execute()
+            .data
+        )
+        # PostgREST renvoie les bytea au format hexadécimal de Postgres ("\x...").
+        return [
+            {"id": row["id"], "darts": bytes.fromhex(row["darts"][2:])}
+            for row in rows if row["darts"] is not None
+        ]
+
+    @retry_read
+    def list_player_stats(self) -> List[Dict]:
+        return self.client.table("player_stats").select(*PLAYER_STATS_COLUMNS).execute().data
+
+    def replace_player_stats(self, stats: List[Dict]) -> None:
+        if stats:
+            self.client.table("player_stats").upsert(stats, on_conflict="player_id").execute()
+
+    def save_match(
+            self,
+            match_id: int,
+            points: List[Dict],
+            state: List[Dict],
+            ranking: List[Dict],
+            stats: List[Dict],
+            darts: bytes
+    ) -> str:
+        # Fonction Postgres transactionnelle, voir sql/save_match.sql
+        try:
+            return self.client.rpc(
+                "save_match",
+                {
+                    "p_match_id": match_id,
+                    "p_points": points,
+                    "p_state": state,
+                    "p_ranking": ranking,
+                    "p_stats": stats,
+                    "p_darts": darts.hex(),
+                }
+            ).execute().data
+        except APIError as e:
+            if e.code == STALE_ELO_ERROR_CODE:
+                raise StaleEloError(e.message) from e
+            raise
+
+
+SQLITE_SCHEMA = """
+create table if not exists players (
+    id integer primary key autoincrement,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    player_name text not null unique,
+    player_elo real not null default 1000
+);
+
+create table if not exists matches (
+    id integer primary key autoincrement,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    is_finished integer not null default 0,
+    darts blob
+);
+
+create table if not exists match_state (
+    match_id integer not null references matches (id),
+    player_id integer not null references players (id),
+    target text not null,
+    score integer not null,
+    primary key (match_id, player_id, target)
+);
+
+create table if not exists match_points (
+    match_id integer not null references matches (id),
+    player_id integer not null references players (id),
+    points integer not null,
+    primary key (match_id, player_id)
+);
+
+create table if not exists match_ranking (
+    match_id integer not null references matches (id),
+    player_id integer not null references players (id),
+    rank integer not null,
+    old_elo real not null,
+    new_elo real not null,
+    delta_elo real not null,
+    primary key (match_id, player_id)
+);
+
+create table if not exists match_events (
+    match_id integer not null references matches (id),
+    seq integer not null,
+    event integer not null,
+    value integer not null,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    primary key (match_id, seq)
+);
+
+create table if not exists player_stats (
+    player_id integer primary key references players (id),
+    games integer not null default 0,
+    wins integer not null default 0,
+    points_conceded integer not null default 0,
+    closed_20 integer not null default 0,
+    closed_19 integer not null default 0,
+    closed_18 integer not null default 0,
+    closed_17 integer not null default 0,
+    closed_16 integer not null default 0,
+    closed_15 integer not null default 0,
+    closed_25 integer not null default 0,
+    elo_peak real
+);
+
+create index if not exists matches_finished_created_at_idx on matches (is_finished, created_at, id);
+create index if not exists match_ranking_player_idx on match_ranking (player_id);
+"""
+
+
+class SqliteStorage(Storage):
+    """Stockage dans une base SQLite locale."""
+
+    # Base verrouillée par un autre processus au-delà du délai d'attente.
+    retryable_errors = (sqlite3.OperationalError,)
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=REQUEST_TIMEOUT, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("pragma foreign_keys = on")
+        if path != ":memory:":
+            self.connection.execute("pragma journal_mode = wal")
+        self.connection.executescript(SQLITE_SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Ajoute aux bases créées par une version précédente les colonnes apparues depuis."""
+        columns = {row["name"] for row in self.connection.execute("pragma table_info(matches)")}
+        if "darts" not in columns:
+            with self.connection:
+                self.connection.execute("alter table matches add column darts blob")
+        columns = {row["name"] for row in self.connection.execute("pragma table_info(match_events)")}
+        if "created_at" not in columns:
+            # alter table n'accepte pas de valeur par défaut non constante :
+            # append_match_events renseigne la colonne explicitement.
+            with self.connection:
+                self.connection.execute("alter table match_events add column created_at text")
+
+    def _fetch(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self.connection.execute(sql, params).fetchall()]
+
+    def _fetch_matches(self, table: str, columns: Tuple[str, ...], match_ids: List[int]) -> List[Dict]:
+        if not match_ids:
+            return []
+        placeholders = ", ".join("?" * len(match_ids))
+        return self._fetch(
+            f"select {', '.join(columns)} from {table} where match_id in ({placeholders})",
+            tuple(match_ids)
+        )
+
+    @retry_read
+    def list_players(self) -> List[Dict]:
+        return self._fetch("select id, player_name, player_elo from players order by id")
+
+    def add_player(self, player_name: str) -> None:
+        with self._lock, self.connection:
+            self.connection.execute(
+                "insert into players (player_name, player_elo) values (?, ?)", (player_name, DEFAULT_ELO)
+            )
+
+    def update_player_elos(self, players: List[Dict]) -> None:
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "update players set player_elo = ? where id = ?",
+                [(player["player_elo"], player["id"]) for player in players]
+            )
+
+    def create_match(self) -> int:
+        with self._lock, self.connection:
+            return self.connection.execute("insert into matches (is_finished) values (0)").lastrowid
+
+    @retry_read
+    def list_finished_matches(
+            self,
+            limit: int,
+            cursor: Optional[Cursor] = None,
+            desc: bool = True,
+            since: Optional[str] = None,
+            until: Optional[str] = None,
+            player_id: Optional[int] = None
+    ) -> List[Dict]:
+        direction, op = ("desc", "<") if desc else ("asc", ">")
+        where = "is_finished = 1"
+        params: Tuple = ()
+        if player_id is not None:
+            where += " and id in (select match_id from match_ranking where player_id = ?)"
+            params += (player_id,)
+        if since is not None:
+            where += " and created_at >= ?"
+            params += (since,)
+        if until is not None:
+            where += " and created_at < ?"
+            params += (until,)
+        if cursor is not None:
+            where += f" and (created_at, id) {op} (?, ?)"
+            params += tuple(cursor)
+        return self._fetch(
+            f"select id, created_at from matches where {where} "
+            f"order by created_at {direction}, id {direction} limit ?",
+            params + (limit,)
+        )
+
+    @retry_read
+    def list_unfinished_matches(self, limit: int) -> List[Dict]:
+        return self._fetch(
+            "select id, created_at from matches where is_finished = 0 "
+            "order by created_at desc, id desc limit ?",
+            (limit,)
+        )
+
+    @retry_read
+    def get_match_state(self, match_ids: List[int]) -> List[Dict]:
+        return self._fetch_matches("match_state", ("match_id", "player_id", "target", "score"), match_ids)
+
+    @retry_read
+    def get_match_points(self, match_ids: List[int]) -> List[Dict]:
+        return self._fetch_matches("match_points", ("match_id", "player_id", "points"), match_ids)
+
+    @retry_read
+    def get_match_ranking(self, match_ids: List[int]) -> List[Dict]:
+        return self._fetch_matches(
+            "match_ranking",
+            ("match_id", "player_id", "rank", "old_elo", "new_elo", "delta_elo"),
+            match_ids
+        )
+
+    @retry_read
+    def list_match_ranking(self) -> List[Dict]:
+        return self._fetch("select match_id, player_id, rank, old_elo from match_ranking order by match_id")
+
+    def append_match_events(self, events: List[Dict]) -> int:
+        with self._lock, self.connection:
+            return self.connection.executemany(
+                "insert or ignore into match_events (match_id, seq, event, value, created_at) "
+                "values (:match_id, :seq, :event, :value, strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))",
+                events
+            ).rowcount
+
+    @retry_read
+    def get_match_events(self, match_ids: List[int]) -> List[Dict]:
+        if not match_ids:
+            return []
+        placeholders = ", ".join("?" * len(match_ids))
+        return self._fetch(
+            f"select match_id, seq, event, value, created_at from match_events "
+            f"where match_id in ({placeholders}) order by match_id, seq",
+            tuple(match_ids)
+        )
+
+    def discard_match(self, match_id: int) -> None:
+        with self._lock, self.connection:
+            self.connection.execute(
+                "delete from match_events where match_id in (select id from matches where id = ? and is_finished = 0)",
+                (match_id,)
+            )
+            self.connection.execute("delete from matches where id = ? and is_finished = 0", (match_id,))
+
+    @retry_read
+    def get_match_darts(self, match_ids: List[int]) -> List[Dict]:
+        if not match_ids:
+            return []
+        placeholders = ", ".join("?" * len(match_ids))
+        return self._fetch(
+            f"select id, darts from matches where id in ({placeholders}) and darts is not null",
+            tuple(match_ids)
+        )
+
+    @retry_read
+    def list_player_stats(self) -> List[Dict]:
+        return self._fetch(f"select {', '.join(PLAYER_STATS_COLUMNS)} from player_stats")
+
+    def replace_player_stats(self, stats: List[Dict]) -> None:
+        with self._lock, self.connection:
+            self.connection.executemany(
+                f"insert or replace into player_stats ({', '.join(PLAYER_STATS_COLUMNS)}) "
+                f"values ({', '.join(':' + column for column in PLAYER_STATS_COLUMNS)})",
+                stats
+            )
+
+    def save_match(
+            self,
+            match_id: int,
+            points: List[Dict],
+            state: List[Dict],
+            ranking: List[Dict],
+            stats: List[Dict],
+            darts: bytes
+    ) -> str:
+        with self._lock, self.connection:
+            updated = self.connection.execute(
+                "update matches set is_finished = 1, darts = ? where id = ? and is_finished = 0 "
+                "returning created_at",
+                (darts, match_id)
+            ).fetchone()
+            if updated is None:
+                raise ValueError(f"Match {match_id} introuvable ou déjà enregistré")
+
+            # La transaction d'écriture est ouverte : aucun autre enregistrement
+            # ne peut modifier ces ELO avant la fin de celui-ci.
+            placeholders = ", ".join("?" * len(ranking))
+            current_elos = dict(self.connection.execute(
+                f"select id, player_elo from players where id in ({placeholders})",
+                tuple(row["player_id"] for row in ranking)
+            ).fetchall())
+            for row in ranking:
+                if abs(current_elos[row["player_id"]] - row["old_elo"]) > ELO_CHECK_TOLERANCE:
+                    raise StaleEloError(f"ELO du joueur {row['player_id']} modifié depuis le calcul du match")
+
+            self.connection.executemany(
+                "insert into match_points (match_id, player_id, points) "
+                "values (:match_id, :player_id, :points)",
+                points
+            )
+            self.connection.executemany(
+                "insert into match_state (match_id, player_id, target, score) "
+                "values (:match_id, :player_id, :target, :score)",
+                state
+            )
+            self.connection.executemany(
+                "insert into match_ranking (match_id, player_id, rank, old_elo, new_elo, delta_elo) "
+                "values (:match_id, :player_id, :rank, :old_elo, :new_elo, :delta_elo)",
+                ranking
+            )
+            self.connection.executemany(
+                "update players set player_elo = :new_elo where id = :player_id",
+                ranking
+            )
+            self.connection.executemany(
+                f"insert into player_stats ({', '.join(PLAYER_STATS_COLUMNS)}) "
+                f"values ({', '.join(':' + column for column in PLAYER_STATS_COLUMNS)}) "
+                f"on conflict (player_id) do update set "
+                + ", ".join(f"{column} = {column} + excluded.{column}" for column in PLAYER_STATS_COUNTERS)
+                + ", elo_peak = max(coalesce(elo_peak, excluded.elo_peak), excluded.elo_peak)",
+                stats
+            )
+            self.connection.execute("delete from match_events where match_id = ?", (match_id,))
+        return updated["created_at"]
+
+
+def _create_supabase_client():
+    """
+    Crée le client Supabase sur un client HTTP partagé : pool de connexions
+    réutilisées entre les requêtes et les threads, et délais par requête.
+
+    L'URL et la clé sont lues comme pour st.connection("supabase") :
+    section [connections.supabase] des secrets, sinon variables d'environnement.
+    """
+    from supabase import ClientOptions, create_client
+
+    try:
+        secrets = st.secrets.get("connections", {}).get("supabase", {})
+    except FileNotFoundError:
+        secrets = {}
+    url = secrets.get("SUPABASE_URL", os.environ.get("SUPABASE_URL"))
+    key = secrets.get("SUPABASE_KEY", os.environ.get("SUPABASE_KEY"))
+
+    http_client = httpx.Client(
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=2 * IO_MAX_WORKERS, max_keepalive_connections=IO_MAX_WORKERS),
+    )
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client))
+
+
+def iter_finished_match_pages(storage: Storage, page_size: int) -> Iterator[List[Dict]]:
+    """
+    Parcourt tous les matchs terminés par ordre chronologique, page par page.
+
+    Chaque page coûte une requête (pagination par clé sur (created_at, id))
+    et seule la page courante est gardée en mémoire.
+
+    Args:
+        storage: Stockage à parcourir
+        page_size: Nombre de matchs par page
+
+    Yields:
+        Pages de lignes matches {id, created_at}
+    """
+    cursor = None
+    while True:
+        matches = storage.list_finished_matches(page_size, cursor, desc=False)
+        if not matches:
+            return
+        yield matches
+        if len(matches) < page_size:
+            return
+        cursor = (matches[-1]["created_at"], matches[-1]["id"])
+
+
+_storage_override: Optional[Storage] = None
+
+
+@st.cache_resource
+def _get_configured_storage() -> Storage:
+    """Construit le stockage configuré dans les secrets Streamlit ([storage] backend)."""
+    try:
+        config = st.secrets.get("storage", {})
+    except FileNotFoundError:
+        config = {}
+    backend = config.get("backend", "supabase")
+
+    if backend == "sqlite":
+        return SqliteStorage(config.get("path", DEFAULT_SQLITE_PATH))
+    if backend == "supabase":
+        return SupabaseStorage(_create_supabase_client())
+
+    raise ValueError(f"Backend de stockage inconnu : {backend}")
+
+
+def get_storage() -> Storage:
+    """Retourne le stockage de l'application (celui imposé par use_storage, sinon celui configuré)."""
+    if _storage_override is not None:
+        return _storage_override
+    return _get_configured_storage()
+
+
+def use_storage(storage: Optional[Storage]) -> None:
+    """
+    Impose un stockage pour tout le processus (benchmarks, scripts), ou
+    revient au stockage configuré si None. Le cache applicatif est vidé.
+    """
+    global _storage_override
+    _storage_override = storage
+    get_cache().clear()
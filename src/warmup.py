@@ -0,0 +1,58 @@
+"""
+Préchargement concurrent des données du premier écran.
+
+Remplace l'ancienne barre de chargement factice : l'annuaire des joueurs
+(noms et ELO courants) et les images sont chargés en parallèle, et la
+progression reflète les tâches réellement terminées. Le classement n'est pas
+préchargé : il est construit à partir de l'annuaire, qu'il relirait en
+parallèle de la tâche "Joueurs" tant que le cache est froid.
+"""
+import time
+from concurrent.futures import as_completed
+from typing import Callable, Dict
+
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from src.assets import get_dart_image, get_icon_data_uris
+from src.io_pool import get_io_executor
+from utils import get_player_directory
+
+logger = get_logger(__name__)
+
+WARMUP_TASKS: Dict[str, Callable[[], object]] = {
+    "Joueurs": get_player_directory,
+    "Images": get_dart_image,
+    "Icônes": get_icon_data_uris,
+}
+
+
+def run_warmup(on_progress: Callable[[str, int, int], None]) -> Dict[str, float]:
+    """
+    Exécute les tâches de préchargement en parallèle, sur le pool d'entrées/sorties.
+
+    Args:
+        on_progress: Appelée dans le thread courant après chaque tâche
+            terminée, avec (nom de la tâche, tâches terminées, total)
+
+    Returns:
+        Durée de chaque tâche en secondes
+    """
+    ctx = get_script_run_ctx()
+    durations = {}
+
+    def timed(name: str, task: Callable[[], object]):
+        add_script_run_ctx(ctx=ctx)
+        start = time.perf_counter()
+        task()
+        return name, time.perf_counter() - start
+
+    executor = get_io_executor()
+    futures = [executor.submit(timed, name, task) for name, task in WARMUP_TASKS.items()]
+    for done, future in enumerate(as_completed(futures), start=1):
+        name, duration = future.result()
+        durations[name] = duration
+        on_progress(name, done, len(futures))
+
+    logger.info("Préchargement terminé : %s", {name: round(d * 1000, 1) for name, d in durations.items()})
+    return durations
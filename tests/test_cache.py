@@ -0,0 +1,43 @@
+"""Cache applicatif : expiration, invalidation par étiquettes et mémoire bornée."""
+from src.cache import TaggedCache, match_ranking_tag
+
+
+def test_expired_entries_are_evicted_with_their_tags():
+    cache = TaggedCache()
+    for match_id in range(100):
+        cache.get_or_load("ranking", match_id, lambda: [match_id], ttl=0, tags=(match_ranking_tag(match_id),))
+
+    # Chaque ajout au-delà de SWEEP_INTERVAL supprime les entrées expirées.
+    cache._next_sweep = 0
+    cache.get_or_load("ranking", "last", lambda: [], ttl=60)
+    assert list(cache._entries) == [("ranking", "last")]
+    assert not cache._keys_by_tag
+    assert not cache._generations and not cache._loading
+
+    assert cache.peek("ranking", 0) is None
+    cache.get_or_load("ranking", 0, lambda: [0], ttl=0, tags=(match_ranking_tag(0),))
+    assert cache.peek("ranking", 0) is None
+    assert ("ranking", 0) not in cache._entries
+    assert match_ranking_tag(0) not in cache._keys_by_tag
+
+
+def test_invalidation_forgets_tags():
+    cache = TaggedCache()
+    for match_id in range(100):
+        cache.get_or_load("ranking", match_id, lambda: [match_id], ttl=60, tags=(match_ranking_tag(match_id),))
+        cache.invalidate(match_ranking_tag(match_id))
+    assert not cache._entries and not cache._keys_by_tag and not cache._generations
+
+
+def test_value_loaded_during_invalidation_is_not_kept():
+    cache = TaggedCache()
+
+    def loader():
+        cache.invalidate("tag")
+        return "périmée"
+
+    assert cache.get_or_load("namespace", "key", loader, ttl=60, tags=("tag",)) == "périmée"
+    assert cache.peek("namespace", "key") is None
+    assert cache.get_or_load("namespace", "key", lambda: "fraîche", ttl=60, tags=("tag",)) == "fraîche"
+    assert cache.peek("namespace", "key") == "fraîche"
+    assert not cache._generations and not cache._loading
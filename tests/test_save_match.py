@@ -0,0 +1,69 @@
+"""Enregistrement d'un match terminé, sur SQLite et sur le client Supabase en mémoire."""
+import pytest
+
+from benchmarks.fake_client import FakeClient
+from src.dart_codec import encode_darts
+from src.game import GameConfig
+from src.storage import SqliteStorage, StaleEloError, SupabaseStorage
+
+
+@pytest.fixture(params=["sqlite", "supabase"])
+def storage(request):
+    storage = SqliteStorage(":memory:") if request.param == "sqlite" else SupabaseStorage(FakeClient())
+    for name in ("A", "B"):
+        storage.add_player(name)
+    return storage
+
+
+def save(storage, match_id, old_elos) -> str:
+    """Enregistre un match gagné par le premier joueur, avec les ELO de départ donnés."""
+    players = storage.list_players()
+    points, state, ranking, stats = [], [], [], []
+    for rank, (player, old_elo) in enumerate(zip(players, old_elos), start=1):
+        row = {"match_id": match_id, "player_id": player["id"]}
+        points.append({**row, "points": 0})
+        state.extend({**row, "target": target, "score": 0} for target in GameConfig.TARGETS)
+        delta = 16.0 if rank == 1 else -16.0
+        ranking.append({**row, "rank": rank, "old_elo": old_elo, "new_elo": old_elo + delta, "delta_elo": delta})
+        stats.append({
+            "player_id": player["id"], "games": 1, "wins": int(rank == 1), "points_conceded": 0,
+            **{f"closed_{target}": 0 for target in GameConfig.TARGETS}, "elo_peak": old_elo + delta,
+        })
+    return storage.save_match(
+        match_id, points, state, ranking, stats, encode_darts([p["id"] for p in players], [], [])
+    )
+
+
+def test_save_match_updates_elos(storage):
+    save(storage, storage.create_match(), [1000.0, 1000.0])
+    assert [player["player_elo"] for player in storage.list_players()] == [1016.0, 984.0]
+
+
+def test_save_match_rejects_stale_elos(storage):
+    save(storage, storage.create_match(), [1000.0, 1000.0])
+
+    # Deuxième match calculé avec les ELO d'avant le premier : rien n'est enregistré.
+    match_id = storage.create_match()
+    with pytest.raises(StaleEloError):
+        save(storage, match_id, [1000.0, 1000.0])
+    assert [player["player_elo"] for player in storage.list_players()] == [1016.0, 984.0]
+    assert storage.get_match_ranking([match_id]) == []
+
+    save(storage, match_id, [1016.0, 984.0])
+    assert [player["player_elo"] for player in storage.list_players()] == [1032.0, 968.0]
+
+
+def test_save_match_deletes_event_journal(storage):
+    match_id, other_id = storage.create_match(), storage.create_match()
+    for event_match_id in (match_id, other_id):
+        storage.append_match_events([{"match_id": event_match_id, "seq": 0, "event": 0, "value": 1}])
+
+    save(storage, match_id, [1000.0, 1000.0])
+    assert storage.get_match_events([match_id]) == []
+    assert len(storage.get_match_events([other_id])) == 1
+
+
+def test_save_match_returns_match_date(storage):
+    match_id = storage.create_match()
+    created_at = save(storage, match_id, [1000.0, 1000.0])
+    assert [match["created_at"] for match in storage.list_finished_matches(10)] == [created_at]
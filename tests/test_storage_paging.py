@@ -0,0 +1,67 @@
+"""Lectures Supabase par tranches, avec le plafond de lignes de PostgREST reproduit par le client en mémoire."""
+import random
+
+import pytest
+
+import src.storage as storage_module
+from benchmarks.fake_client import FakeClient
+from src.game import GameConfig
+from src.stats import compute_player_stats
+from src.storage import SupabaseStorage
+
+MAX_ROWS = 50
+NUM_MATCHES = 40
+NUM_PLAYERS = 6
+
+
+def populate(client: FakeClient, rng: random.Random) -> None:
+    """Remplit le client avec des matchs terminés aléatoires."""
+    for _ in range(NUM_MATCHES):
+        match_row = client.new_row("matches", {"is_finished": True})
+        client.tables.setdefault("matches", []).append(match_row)
+        player_ids = rng.sample(range(1, NUM_PLAYERS + 1), rng.randint(2, 4))
+        for rank, player_id in enumerate(player_ids, start=1):
+            row = {"match_id": match_row["id"], "player_id": player_id}
+            client.tables.setdefault("match_points", []).append({**row, "points": rng.randint(0, 200)})
+            client.tables.setdefault("match_ranking", []).append({
+                **row, "rank": rank, "old_elo": 1000.0, "new_elo": 1000.0 + rng.uniform(-20, 20), "delta_elo": 0.0,
+            })
+            for target in GameConfig.TARGETS:
+                client.tables.setdefault("match_state", []).append({**row, "target": target, "score": rng.randint(0, 3)})
+
+
+@pytest.fixture
+def capped_storage(monkeypatch):
+    monkeypatch.setattr(storage_module, "SUPABASE_MAX_ROWS", MAX_ROWS)
+    client = FakeClient(max_rows=MAX_ROWS)
+    populate(client, random.Random(0))
+    return SupabaseStorage(client)
+
+
+def test_match_reads_are_not_truncated(capped_storage):
+    match_ids = [match["id"] for match in capped_storage.client.tables["matches"]]
+    assert len(capped_storage.client.tables["match_state"]) > MAX_ROWS
+    for method, table in (
+            (capped_storage.get_match_state, "match_state"),
+            (capped_storage.get_match_points, "match_points"),
+            (capped_storage.get_match_ranking, "match_ranking"),
+    ):
+        assert len(method(match_ids)) == len(capped_storage.client.tables[table])
+    assert len(capped_storage.list_match_ranking()) == len(capped_storage.client.tables["match_ranking"])
+
+
+def test_player_stats_rebuild_with_capped_client(capped_storage):
+    uncapped = FakeClient()
+    uncapped.tables = capped_storage.client.tables
+
+    expected = {}
+    for row in uncapped.tables["match_state"]:
+        if row["score"] == GameConfig.MAX_SCORE_PER_TARGET:
+            key = (row["player_id"], row["target"])
+            expected[key] = expected.get(key, 0) + 1
+
+    stats = compute_player_stats(capped_storage, page_size=20)
+    assert stats == compute_player_stats(SupabaseStorage(uncapped), page_size=20)
+    for (player_id, target), count in expected.items():
+        assert stats[player_id][f"closed_{target}"] == count
+    assert sum(entry["games"] for entry in stats.values()) == len(uncapped.tables["match_ranking"])
@@ -1,82 +1,164 @@
-import streamlit as st
-from st_supabase_connection import SupabaseConnection
+import threading
+
+import numpy as np
 from typing import List, Dict, Optional
 
+from src.cache import (
+    LEADERBOARD,
+    PLAYER_ELO,
+    PLAYER_STATS,
+    ROSTER,
+    cached,
+    get_cache,
+    match_ranking_tag,
+    player_history_tag,
+)
+from src.storage import get_storage
+
+ELO_K_FACTOR = 32
+ELO_DIVISOR = 400
+
+ROSTER_TTL = 300
+LEADERBOARD_TTL = 300
+MATCH_RANKING_TTL = 24 * 3600
+MATCH_DARTS_TTL = 24 * 3600
+
 
-@st.cache_resource
-def get_client():
-    """Retourne le client Supabase."""
-    conn = st.connection("supabase", type=SupabaseConnection)
-    return conn.client
+class PlayerDirectory:
+    """
+    Annuaire des joueurs chargé en une seule requête sur la table players.
+    
+    Tient les correspondances id ↔ nom ↔ ELO en mémoire. L'instance est
+    partagée par tout le processus via le cache applicatif (voir
+    get_player_directory) : elle est rechargée après l'ajout d'un joueur
+    (invalidate_roster) et mise à jour sur place après un match (apply_elo_updates).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.id_to_name: Dict[int, str] = {}
+        self.name_to_id: Dict[str, int] = {}
+        self.elo_by_id: Dict[int, Optional[float]] = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Recharge l'annuaire complet depuis la base de données."""
+        with self._lock:
+            rows = get_storage().list_players()
+            id_to_name = {int(row["id"]): row["player_name"] for row in rows}
+            elo_by_id = {
+                int(row["id"]): float(row["player_elo"]) if row["player_elo"] is not None else None
+                for row in rows
+            }
+            self.id_to_name, self.name_to_id, self.elo_by_id = (
+                id_to_name,
+                {name: player_id for player_id, name in id_to_name.items()},
+                elo_by_id,
+            )
+
+    def set_elos(self, elos_by_id: Dict[int, float]) -> None:
+        """Applique des ELO déjà enregistrés en base, sans nouvelle requête."""
+        with self._lock:
+            elo_by_id = dict(self.elo_by_id)
+            elo_by_id.update({int(player_id): float(elo) for player_id, elo in elos_by_id.items()})
+            self.elo_by_id = elo_by_id
+
+    def names(self) -> List[str]:
+        """Retourne la liste des noms de joueurs."""
+        return list(self.id_to_name.values())
+
+    def get_id(self, player_name: str) -> Optional[int]:
+        """Retourne l'ID d'un joueur à partir de son nom."""
+        return self.name_to_id.get(player_name)
+
+    def get_name(self, player_id: int) -> Optional[str]:
+        """Retourne le nom d'un joueur à partir de son ID."""
+        return self.id_to_name.get(int(player_id))
+
+    def get_elo(self, player_name: str) -> Optional[float]:
+        """Retourne l'ELO d'un joueur à partir de son nom."""
+        player_id = self.get_id(player_name)
+        return self.elo_by_id.get(player_id) if player_id is not None else None
+
+
+@cached("player_directory", ROSTER_TTL, tags=lambda: (ROSTER, PLAYER_ELO))
+def get_player_directory() -> PlayerDirectory:
+    """Retourne l'annuaire des joueurs partagé par le processus."""
+    return PlayerDirectory()
+
+
+def invalidate_roster() -> None:
+    """Invalide l'annuaire et le classement, après l'ajout d'un joueur."""
+    get_cache().invalidate(ROSTER, LEADERBOARD)
+
+
+def apply_elo_updates(elos_by_id: Dict[int, float], match_id: int) -> None:
+    """
+    Répercute les ELO d'un match qui vient d'être enregistré : l'annuaire est
+    mis à jour sur place, le classement, les statistiques des joueurs, le
+    classement du match et les données tirées des derniers matchs de ses
+    joueurs sont invalidés.
+    """
+    get_player_directory().set_elos(elos_by_id)
+    get_cache().invalidate(
+        LEADERBOARD,
+        PLAYER_STATS,
+        match_ranking_tag(match_id),
+        *(player_history_tag(player_id) for player_id in elos_by_id),
+    )
 
 
 def get_player_list() -> List[str]:
     """Retourne la liste des noms de joueurs."""
-    client = get_client()
-    player_list = client.table("players").select("player_name").execute()
-    return [player["player_name"] for player in player_list.data]
+    return get_player_directory().names()
 
 
+@cached("leaderboard", LEADERBOARD_TTL, tags=lambda: (LEADERBOARD, ROSTER, PLAYER_ELO))
 def get_leaderbord() -> List[Dict]:
     """Retourne le classement ELO des joueurs."""
-    client = get_client()
-    return client.table("players").select("player_name", "player_elo").order("player_elo", desc=True).execute().data
+    directory = get_player_directory()
+    leaderboard = [
+        {"player_name": name, "player_elo": directory.elo_by_id[player_id]}
+        for player_id, name in directory.id_to_name.items()
+    ]
+    return sorted(leaderboard, key=lambda row: row["player_elo"] or 0, reverse=True)
 
 
-@st.cache_data
 def get_player_id(player_name: str) -> Optional[int]:
     """Retourne l'ID d'un joueur à partir de son nom."""
-    client = get_client()
-    result = (
-        client
-        .table("players")
-        .select("id")
-        .eq("player_name", player_name)
-        .execute()
-    )
-    return result.data[0]["id"] if result.data else None
+    return get_player_directory().get_id(player_name)
 
 
 def get_player_elo(player_name: str) -> Optional[float]:
     """Retourne l'ELO actuel d'un joueur."""
-    client = get_client()
-    result = (
-        client
-        .table("players")
-        .select("player_elo")
-        .eq("player_name", player_name)
-        .execute()
-    )
-    return float(result.data[0]["player_elo"]) if result.data else None
+    return get_player_directory().get_elo(player_name)
 
 
-@st.cache_data
 def get_player_name(player_id: int) -> Optional[str]:
     """Retourne le nom d'un joueur à partir de son ID."""
-    client = get_client()
-    result = (
-        client
-        .table("players")
-        .select("player_name")
-        .eq("id", player_id)
-        .execute()
-    )
-    return result.data[0]["player_name"] if result.data else None
+    return get_player_directory().get_name(player_id)
+
+
+@cached("match_ranking", MATCH_RANKING_TTL, tags=lambda match_id: (match_ranking_tag(match_id),))
+def get_match_ranking_rows(match_id: int) -> Optional[List[Dict]]:
+    """Retourne les lignes match_ranking d'un match, ou None s'il n'est pas encore enregistré."""
+    return get_storage().get_match_ranking([match_id]) or None
+
+
+@cached("match_darts", MATCH_DARTS_TTL, tags=lambda match_id: ())
+def get_match_darts(match_id: int) -> Optional[bytes]:
+    """Retourne les fléchettes encodées d'un match terminé, ou None si elles n'ont pas été enregistrées."""
+    rows = get_storage().get_match_darts([match_id])
+    return rows[0]["darts"] if rows else None
 
 
-@st.cache_data
 def get_delta_elo(match_id: int, player: str) -> Optional[float]:
     """Retourne la variation d'ELO d'un joueur pour un match donné."""
-    client = get_client()
-    result = (
-        client
-        .table("match_ranking")
-        .select("delta_elo")
-        .eq("match_id", match_id)
-        .eq("player_id", get_player_id(player))
-        .execute()
-    )
-    return result.data[0]["delta_elo"] if result.data else None
+    player_id = get_player_id(player)
+    for row in get_match_ranking_rows(match_id) or []:
+        if row["player_id"] == player_id:
+            return row["delta_elo"]
+    return None
 
 
 def get_player_rank(players_ranking: Dict[str, List[str]], player_name: str) -> Optional[int]:
@@ -87,42 +169,66 @@ def get_player_rank(players_ranking: Dict[str, List[str]], player_name: str) ->
     return None
 
 
-def calcul_delta_elo(players_ranking: Dict[str, List[str]], player_list: List[str]) -> Dict[str, float]:
+def compute_elo_deltas(
+        elos: np.ndarray,
+        ranks: np.ndarray,
+        k_factor: float = ELO_K_FACTOR,
+        divisor: float = ELO_DIVISOR
+) -> np.ndarray:
+    """
+    Calcule les variations d'ELO à partir d'un instantané des ELO et des rangs.
+    
+    La matrice des scores attendus (probabilité que i batte j) et celle des
+    résultats réels sont calculées en une fois. Les dimensions initiales
+    éventuelles sont traitées comme un lot de matchs indépendants.
+
+    Args:
+        elos: ELO des joueurs, de forme (..., P)
+        ranks: Rangs des joueurs (1 = meilleur), de même forme
+        k_factor: Facteur K du système ELO
+        divisor: Diviseur de l'écart d'ELO dans le score attendu
+
+    Returns:
+        Variations d'ELO non arrondies, de forme (..., P)
+    """
+    elos = np.asarray(elos, dtype=np.float64)
+    ranks = np.asarray(ranks)
+    num_players = elos.shape[-1]
+
+    expected = 1 / (1 + 10 ** ((elos[..., np.newaxis, :] - elos[..., :, np.newaxis]) / divisor))
+    real = (np.sign(ranks[..., np.newaxis, :] - ranks[..., :, np.newaxis]) + 1) / 2
+    diff = real - expected
+
+    # Somme colonne par colonne : même ordre d'accumulation que le calcul joueur par joueur
+    # (la diagonale vaut exactement 0).
+    delta = np.zeros(elos.shape)
+    for other in range(num_players):
+        delta += diff[..., other]
+
+    return (k_factor * delta) / (num_players - 1)
+
+
+def calcul_delta_elo(
+        players_ranking: Dict[str, List[str]],
+        player_list: List[str],
+        player_elos: Optional[Dict[str, float]] = None
+) -> Dict[str, float]:
     """
     Calcule les variations d'ELO pour tous les joueurs selon le système ELO.
 
     Args:
         players_ranking: Classement des joueurs {rang: [joueurs]}
         player_list: Liste des joueurs du match
+        player_elos: Instantané des ELO {joueur: elo}, lu dans l'annuaire si absent
 
     Returns:
         Dictionnaire {joueur: delta_elo}
     """
-    result = {}
-
-    player_elo_rank = {}
-    for player in player_list:
-        player_elo_rank[player] = {
-            "elo": get_player_elo(player),
-            "rank": get_player_rank(players_ranking, player)
-        }
-
-    for player in player_list:
-        delta = 0
-        for other_player in player_list:
-            if other_player != player:
-                prob = 1 / (1 + 10 ** ((player_elo_rank[other_player]["elo"] - player_elo_rank[player]["elo"]) / 400))
-
-                if player_elo_rank[player]["rank"] < player_elo_rank[other_player]["rank"]:
-                    real = 1
-                elif player_elo_rank[player]["rank"] == player_elo_rank[other_player]["rank"]:
-                    real = 0.5
-                else:
-                    real = 0
-
-                delta += real - prob
-
-        delta = round((32 * delta) / (len(player_list) - 1), 2)
-        result[player] = delta
-
-    return result
\ No newline at end of file
+    if player_elos is None:
+        player_elos = {player: get_player_elo(player) for player in player_list}
+
+    elos = np.array([player_elos[player] for player in player_list], dtype=np.float64)
+    ranks = np.array([get_player_rank(players_ranking, player) for player in player_list])
+    deltas = compute_elo_deltas(elos, ranks)
+
+    return {player: round(float(delta), 2) for player, delta in zip(player_list, deltas)}